@@ -0,0 +1,157 @@
+"""Upload and export benchmark: the old list-of-dicts path against the columnar one.
+
+For each file size, two cases run in fresh subprocesses so peak RSS is
+per case:
+
+  before  json.load, then json.dumps of the whole dataset (what st.json
+          sends to the browser) = time to interactive; export is
+          DataFrame(data).to_json(orient="records", indent=4) in memory
+  after   data_io.load_dataframe, a 20-row preview and the schema = time
+          to interactive; export is data_io.write_export to JSONL and Parquet
+
+    python bench_upload.py generate --rows 10000 100000 1000000
+    python bench_upload.py run --rows 10000 100000 1000000 --output bench_upload.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data")
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample.json")
+
+
+def data_path(rows: int, fmt: str) -> str:
+    return os.path.join(DATA_DIR, f"upload_{rows}.{fmt}")
+
+
+def generate(rows: int, fmt: str) -> str:
+    """``rows`` records cycled from sample.json, each made unique by its index."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(SAMPLE, encoding="utf-8") as f:
+        base = json.load(f)
+    path = data_path(rows, fmt)
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "json":
+            f.write("[\n")
+        for i in range(rows):
+            record = dict(base[i % len(base)])
+            record["instruction"] = f"{record.get('instruction', '')} ({i})"
+            line = json.dumps(record, ensure_ascii=False)
+            if fmt == "json":
+                f.write(("    " if i == 0 else ",\n    ") + line)
+            else:
+                f.write(line + "\n")
+        if fmt == "json":
+            f.write("\n]\n")
+    return path
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    import pandas as pd
+
+    path = case["path"]
+    start = time.perf_counter()
+    if case["mode"] == "before":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        payload = json.dumps(data)
+        interactive_s = time.perf_counter() - start
+        rss_interactive = max_rss_mb()
+        start = time.perf_counter()
+        exported = len(pd.DataFrame(data).to_json(orient="records", indent=4))
+        del payload
+    else:
+        from data_io import load_path, schema_of, write_export
+
+        df, _ = load_path(path)
+        df.head(20).to_json(orient="records")
+        schema_of(df)
+        interactive_s = time.perf_counter() - start
+        rss_interactive = max_rss_mb()
+        start = time.perf_counter()
+        exported = 0
+        for fmt in ("JSONL", "Parquet"):
+            out = write_export(df, fmt)
+            exported += os.path.getsize(out)
+            os.remove(out)
+    return {
+        **case,
+        "interactive_s": round(interactive_s, 2),
+        "interactive_rss_mb": round(rss_interactive, 1),
+        "export_s": round(time.perf_counter() - start, 2),
+        "export_mb": round(exported / 2**20, 1),
+        "peak_rss_mb": round(max_rss_mb(), 1),
+    }
+
+
+def run_in_subprocess(case: Dict[str, Any]) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile("r", suffix=".json") as result:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "once", "--case", json.dumps(case), "--result", result.name],
+            check=True,
+        )
+        return json.load(result)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="write synthetic upload files to bench_data/")
+    gen.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    gen.add_argument("--format", choices=("json", "jsonl"), default="json")
+    run = sub.add_parser("run", help="time both paths on each file size")
+    run.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    run.add_argument("--format", choices=("json", "jsonl"), default="json", help="'before' only reads JSON arrays")
+    run.add_argument("--output", default=None, help="optionally write the results as JSON")
+    once = sub.add_parser("once")
+    once.add_argument("--case", required=True)
+    once.add_argument("--result", required=True)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        for rows in args.rows:
+            path = generate(rows, args.format)
+            print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MiB")
+    elif args.command == "once":
+        with open(args.result, "w") as f:
+            json.dump(run_case(json.loads(args.case)), f)
+    else:
+        results = []
+        print(f"{'rows':>9} {'mode':>7} {'file MiB':>9} {'interactive s':>14} {'RSS@interactive':>16} "
+              f"{'export s':>9} {'peak RSS MiB':>13}")
+        for rows in args.rows:
+            path = data_path(rows, args.format)
+            if not os.path.exists(path):
+                generate(rows, args.format)
+            for mode in ("before", "after"):
+                if mode == "before" and args.format != "json":
+                    continue
+                case = {"rows": rows, "mode": mode, "path": path, "file_mb": round(os.path.getsize(path) / 2**20, 1)}
+                try:
+                    r = run_in_subprocess(case)
+                except subprocess.CalledProcessError as exc:
+                    # The old path runs out of memory on the largest files; that is a result too
+                    results.append({**case, "error": f"exit status {exc.returncode}"})
+                    print(f"{rows:>9} {mode:>7} {case['file_mb']:>9}  failed (exit status {exc.returncode}, likely out of memory)")
+                    continue
+                results.append(r)
+                print(f"{rows:>9} {mode:>7} {r['file_mb']:>9} {r['interactive_s']:>14} {r['interactive_rss_mb']:>16} "
+                      f"{r['export_s']:>9} {r['peak_rss_mb']:>13}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Upload parsing into a columnar store, and streaming exports.
+
+Uploads may be JSON (a top-level array, or an object holding the records
+under one of ``records.CONTAINER_KEYS``), JSONL or Parquet. Any of them may be
+gzip, bz2, xz or (with ``zstandard`` installed) zstd compressed. The
+format and compression are detected from the file's first bytes, so the
+file extension does not matter.
+
+JSON and JSONL are decoded record by record by the embedding pipeline's
+streaming reader (grove-task-mixture-embed/records.py, via
+``embed_pipeline``) and collected ``CHUNK_ROWS``
+at a time into DataFrame chunks. Only one chunk of Python dicts is alive
+at a time. Exports go the other way: the DataFrame is written to a
+temporary file in chunks (JSONL or Parquet), instead of being rendered
+into a single in-memory string.
+"""
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from embed_pipeline import records
+
+CHUNK_ROWS = 50_000
+READ_SIZE = 1 << 20
+UPLOAD_TYPES = ["json", "jsonl", "ndjson", "parquet", "gz", "bz2", "xz", "zst"]
+EXPORT_FORMATS = {"JSONL": ("jsonl", "application/x-ndjson"), "Parquet": ("parquet", "application/vnd.apache.parquet")}
+
+_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+
+def open_decompressed(raw: BinaryIO) -> Tuple[BinaryIO, str]:
+    """``raw`` wrapped in a decompressor chosen by its magic bytes, and the compression name ("none" if plain)."""
+    head = raw.read(8)
+    raw.seek(0)
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            if name == "gzip":
+                return gzip.GzipFile(fileobj=raw), name
+            if name == "bz2":
+                return bz2.BZ2File(raw), name
+            if name == "xz":
+                return lzma.LZMAFile(raw), name
+            try:
+                import zstandard
+            except ImportError as exc:
+                raise ValueError("zstd-compressed upload: install the 'zstandard' package to read it") from exc
+            return zstandard.ZstdDecompressor().stream_reader(raw), name
+    return raw, "none"
+
+
+def _peek(stream: BinaryIO, size: int = 64 << 10) -> Tuple[bytes, BinaryIO]:
+    """The first ``size`` bytes of a possibly unseekable stream, and a stream that still starts at byte 0."""
+    buffered = io.BufferedReader(stream, buffer_size=max(size, READ_SIZE)) if not hasattr(stream, "peek") else stream
+    return buffered.peek(size)[:size], buffered
+
+
+def detect_format(head: bytes) -> str:
+    if head.startswith(b"PAR1"):
+        return "parquet"
+    text = head.decode("utf-8", errors="ignore").lstrip(records.BOM + records.WHITESPACE)
+    if text.startswith("["):
+        return "json"
+    if not text.startswith("{"):
+        raise ValueError("The file is neither JSON, JSONL nor Parquet")
+    # JSONL when the first line is a whole object and another one follows it
+    first, _, rest = text.partition("\n")
+    try:
+        return "jsonl" if isinstance(json.loads(first), dict) and rest.lstrip().startswith("{") else "json"
+    except ValueError:
+        return "json"
+
+
+def _frames(records: Iterator[Tuple[int, Dict[str, Any]]], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    chunk: List[Dict[str, Any]] = []
+    for _, record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            yield pd.DataFrame.from_records(chunk)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame.from_records(chunk)
+
+
+def load_dataframe(raw: BinaryIO, chunk_rows: int = CHUNK_ROWS) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Parse an upload into one DataFrame; also returns format, compression, rows and seconds taken."""
+    start = time.perf_counter()
+    stream, compression = open_decompressed(raw)
+    head, stream = _peek(stream)
+    fmt = detect_format(head)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        # Parquet needs random access; compressed containers are read into memory first
+        source = stream if compression == "none" else io.BytesIO(stream.read())
+        df = pq.read_table(source).to_pandas()
+    else:
+        frames = list(_frames(records.iter_stream_records(stream, fmt == "jsonl", READ_SIZE), chunk_rows))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    info = {"format": fmt, "compression": compression, "rows": len(df), "columns": len(df.columns),
+            "seconds": round(time.perf_counter() - start, 3)}
+    return df, info
+
+
+def data_dir_path(data_dir: str, name: str) -> str:
+    """``name`` resolved inside ``data_dir``; raises ValueError if it points anywhere outside it."""
+    root = os.path.realpath(data_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{name} is outside the data directory")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(name)
+    return path
+
+
+def load_path(path: str, chunk_rows: int = CHUNK_ROWS) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    with open(path, "rb") as f:
+        return load_dataframe(f, chunk_rows)
+
+
+def schema_of(df: pd.DataFrame) -> pd.DataFrame:
+    """Column, dtype and non-null count per column."""
+    return pd.DataFrame({
+        "column": df.columns,
+        "dtype": [str(t) for t in df.dtypes],
+        "non_null": [int(n) for n in df.notna().sum()],
+    })
+
+
+def write_jsonl(df: pd.DataFrame, path: str, chunk_rows: int = CHUNK_ROWS) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, len(df), chunk_rows):
+            # Each chunk already ends with a newline
+            f.write(df.iloc[start:start + chunk_rows].to_json(orient="records", lines=True, force_ascii=False))
+
+
+def write_parquet(df: pd.DataFrame, path: str, chunk_rows: int = CHUNK_ROWS) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Inferred over all rows, so a column that is empty in the first chunk still gets its real type
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema, preserve_index=False))
+
+
+def write_export(df: pd.DataFrame, fmt: str, chunk_rows: int = CHUNK_ROWS) -> str:
+    """Write ``df`` as ``fmt`` ("JSONL" or "Parquet") to a temporary file chunk by chunk; returns its path."""
+    suffix, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix="grove_export_", suffix=f".{suffix}")
+    os.close(fd)
+    (write_jsonl if fmt == "JSONL" else write_parquet)(df, path, chunk_rows)
+    return path
+
+
+def content_hash(df: pd.DataFrame) -> int:
+    """Hash of the index and every value; columns holding unhashable values (lists, dicts) are hashed as text."""
+    columns = {}
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        try:
+            columns[i] = pd.util.hash_pandas_object(column, index=False)
+        except TypeError:
+            columns[i] = pd.util.hash_pandas_object(column.astype(str), index=False)
+    return int(pd.util.hash_pandas_object(pd.DataFrame(columns, index=df.index), index=True).sum())
+
+
+def export_buttons(st, df: pd.DataFrame, file_stem: str, key: str) -> None:
+    """Format choice, a 'Prepare' button that writes the export file, and a download button streaming that file.
+
+    The file is only written when asked for, not on every page rerun.
+    """
+    fmt = st.radio("Export format", list(EXPORT_FORMATS), horizontal=True, key=f"{key}_format")
+    state_key = f"{key}_export"
+    # A prepared file is only offered while the data it was written from is unchanged (a new upload of the same
+    # shape, or labels filled in since, make it stale)
+    signature = (fmt, len(df), tuple(df.columns), content_hash(df))
+    if st.button(f"Prepare {fmt} Download", key=f"{key}_prepare"):
+        previous = st.session_state.get(state_key)
+        if previous and os.path.exists(previous[1]):
+            os.remove(previous[1])
+        with st.spinner(f"Writing {len(df)} rows..."):
+            st.session_state[state_key] = (signature, write_export(df, fmt))
+    prepared = st.session_state.get(state_key)
+    if prepared and prepared[0] == signature and os.path.exists(prepared[1]):
+        suffix, mime = EXPORT_FORMATS[fmt]
+        with open(prepared[1], "rb") as f:
+            st.download_button(
+                label=f"Download as {fmt} ({os.path.getsize(prepared[1]) / 2**20:.1f} MiB)",
+                data=f,
+                file_name=f"{file_stem}.{suffix}",
+                mime=mime,
+                key=f"{key}_download",
+            )
@@ -0,0 +1,32 @@
+"""Modules the app shares with the embedding pipeline in grove-task-mixture-embed.
+
+``records`` (the streaming JSON / JSONL reader behind uploads) and
+``embedding_cache`` (the SQLite embedding cache behind pre-labeling) are
+used as they are rather than copied. The pipeline directory is not an
+importable package, so each module is loaded from its file under a
+``grove_embed_`` name. Nothing is added to ``sys.path``, so no other
+pipeline module can shadow or be shadowed by the app's own modules.
+Both modules only use the standard library.
+"""
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+EMBED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grove-task-mixture-embed")
+
+
+def _load(name: str) -> ModuleType:
+    module_name = f"grove_embed_{name}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(EMBED_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registered before running it, as dataclasses look the module up while it executes
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+records = _load("records")
+embedding_cache = _load("embedding_cache")
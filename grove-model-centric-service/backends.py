@@ -0,0 +1,149 @@
+import os
+from typing import Dict, Tuple, Type
+
+import torch
+from torch import nn
+from transformers import AutoModel
+
+from capture import first_last_hidden_states
+from shared_weights import load_mmap_model
+
+WEIGHT_MODES = ("private", "mmap")
+
+
+class InferenceBackend:
+    """fp32 eager PyTorch: the reference every other backend is compared against."""
+
+    name = "eager"
+    dtype = torch.float32
+
+    def __init__(self, model_path: str, capture_mode: str = "lean", weights: str = "private") -> None:
+        if weights not in WEIGHT_MODES:
+            raise ValueError(f"Unknown weights mode '{weights}', expected one of {WEIGHT_MODES}")
+        self.model_path = model_path
+        self.capture_mode = capture_mode
+        self.weights = weights
+        self.model = self.load_model()
+
+    def load_model(self) -> nn.Module:
+        if self.weights == "mmap":
+            # Parameters are views of the mapped safetensors files, shared between workers.
+            return load_mmap_model(self.model_path, self.dtype)
+        model = AutoModel.from_pretrained(self.model_path)
+        model.eval()
+        return model
+
+    def first_last(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """``(hidden_states[0], hidden_states[-1])`` as float32 ``[batch, seq, hidden]`` tensors."""
+        with torch.no_grad():
+            first, last = first_last_hidden_states(self.model, input_ids, attention_mask, mode=self.capture_mode)
+        return first.float(), last.float()
+
+
+class Int8Backend(InferenceBackend):
+    """Dynamic int8 quantization of every ``nn.Linear``; embeddings stay fp32."""
+
+    name = "int8"
+
+    def load_model(self) -> nn.Module:
+        from torch.ao.quantization import quantize_dynamic
+
+        return quantize_dynamic(super().load_model(), {nn.Linear}, dtype=torch.qint8)
+
+
+class BF16Backend(InferenceBackend):
+    """Weights and activations in bfloat16; needs native CPU support (AVX512-BF16/AMX) to pay off."""
+
+    name = "bf16"
+    dtype = torch.bfloat16
+
+    def load_model(self) -> nn.Module:
+        if not torch.ops.mkldnn._is_mkldnn_bf16_supported():
+            raise RuntimeError("bf16 backend requested but this CPU has no native bfloat16 support.")
+        return super().load_model().to(torch.bfloat16)
+
+
+class CompiledBackend(InferenceBackend):
+    """``torch.compile`` with dynamic shapes, so new batch/sequence sizes do not recompile."""
+
+    name = "compile"
+
+    def load_model(self) -> nn.Module:
+        model = super().load_model()
+        model.forward = torch.compile(model.forward, dynamic=True)
+        return model
+
+
+class _FirstLastModule(nn.Module):
+    def __init__(self, model: nn.Module) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        return first_last_hidden_states(self.model, input_ids, attention_mask)
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime session over an exported first/last hidden-state graph.
+
+    The graph is exported once to ``<model_path>/onnx/first_last.onnx`` and
+    reused on later starts.
+    """
+
+    name = "onnx"
+
+    def load_model(self) -> nn.Module:
+        try:
+            import onnxruntime  # type: ignore
+        except Exception as exc:  # pragma: no cover
+            raise RuntimeError("onnx backend requires onnxruntime. Install via 'pip install onnxruntime onnx'.") from exc
+
+        onnx_path = os.path.join(self.model_path, "onnx", "first_last.onnx")
+        if not os.path.exists(onnx_path):
+            self.export(onnx_path)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        return None  # type: ignore
+
+    def export(self, onnx_path: str) -> None:
+        os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+        wrapper = _FirstLastModule(super().load_model())
+        # A padded row in the example keeps the attention-mask path in the traced graph.
+        input_ids = torch.ones(2, 8, dtype=torch.long)
+        attention_mask = torch.ones(2, 8, dtype=torch.long)
+        attention_mask[1, 5:] = 0
+        with torch.no_grad():
+            torch.onnx.export(
+                wrapper,
+                (input_ids, attention_mask),
+                onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["first", "last"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "seq"},
+                    "attention_mask": {0: "batch", 1: "seq"},
+                    "first": {0: "batch", 1: "seq"},
+                    "last": {0: "batch", 1: "seq"},
+                },
+                dynamo=False,
+            )
+
+    def first_last(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        first, last = self.session.run(
+            ["first", "last"],
+            {"input_ids": input_ids.numpy(), "attention_mask": attention_mask.numpy()},
+        )
+        return torch.from_numpy(first), torch.from_numpy(last)
+
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    backend.name: backend
+    for backend in (InferenceBackend, Int8Backend, BF16Backend, CompiledBackend, OnnxBackend)
+}
+
+
+def load_backend(name: str, model_path: str, capture_mode: str = "lean", weights: str = "private") -> InferenceBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {tuple(BACKENDS)}")
+    return BACKENDS[name](model_path, capture_mode=capture_mode, weights=weights)
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass
+class BatchStats:
+    """Running batch-size and queue-wait statistics of a MicroBatcher."""
+
+    window: int = 4096
+    batches: int = 0
+    items: int = 0
+    max_batch_size: int = 0
+    size_histogram: Dict[int, int] = field(default_factory=dict)
+    waits_ms: Deque[float] = field(default_factory=deque)
+
+    def record(self, size: int, waits_ms: Sequence[float]) -> None:
+        self.batches += 1
+        self.items += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+        self.waits_ms.extend(waits_ms)
+        while len(self.waits_ms) > self.window:
+            self.waits_ms.popleft()
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.waits_ms)
+
+        def percentile(q: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(q * len(waits)))]
+
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_histogram": dict(sorted(self.size_histogram.items())),
+            "queue_wait_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": waits[-1] if waits else 0.0,
+            },
+        }
+
+
+class MicroBatcher:
+    """Coalesces concurrent submissions into a single call of ``fn``.
+
+    Items arriving within ``max_wait_ms`` of the first queued item are
+    grouped, up to ``max_batch_size``, and ``fn`` is called once with the
+    list of items. ``fn`` must return one result per item, in order.
+
+    With an ``executor``, ``fn`` runs there instead of on the event loop, with
+    at most ``concurrency`` batches in flight; the next batch keeps filling
+    while earlier ones run.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        executor: Optional[Executor] = None,
+        concurrency: int = 1,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self.stats = BatchStats()
+        self._slots = concurrency
+        self._queue: "asyncio.Queue[Tuple[Any, asyncio.Future, float]]" = None  # type: ignore
+        self._worker: "asyncio.Task" = None  # type: ignore
+        self._batches: Set["asyncio.Task"] = set()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self._slots)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        pending = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return pending
+
+    async def _run(self) -> None:
+        while True:
+            await self._semaphore.acquire()
+            try:
+                pending = await self._collect()
+            except BaseException:
+                self._semaphore.release()
+                raise
+            pending = [p for p in pending if not p[1].cancelled()]
+            if not pending:
+                self._semaphore.release()
+                continue
+            dispatched = time.perf_counter()
+            self.stats.record(len(pending), [(dispatched - t) * 1000.0 for _, _, t in pending])
+            batch = asyncio.get_running_loop().create_task(self._dispatch(pending))
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, pending: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        items = [item for item, _, _ in pending]
+        try:
+            if self.executor is None:
+                results = self.fn(items)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(self.executor, self.fn, items)
+        except Exception as exc:
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            self._semaphore.release()
+        for (_, future, _), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for batch in list(self._batches):
+            batch.cancel()
@@ -0,0 +1,113 @@
+"""Parity and latency/memory benchmark of the variability inference backends.
+
+Every backend scores the same instructions in its own process. Scores are
+compared against fp32 eager (Pearson correlation and max absolute
+deviation) next to p50/p99 latency and peak RSS, so a backend can be chosen
+per deployment (VARIABILITY_BACKEND).
+
+    python bench_backends.py --model-path ./model/Llama-3.2-1B-Instruct --backends eager int8 bf16 compile onnx
+"""
+import argparse
+import json
+import multiprocessing as mp
+import statistics
+import time
+from typing import Dict, List
+
+import torch
+from transformers import AutoTokenizer
+
+from backends import BACKENDS, load_backend
+from bench_utils import max_rss_mb, percentile
+from divergence import jensen_shannon_divergence
+
+
+def load_texts(path: str, limit: int) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    return [record["inputs"] for record in records if record.get("inputs")][:limit]
+
+
+def _run_backend(name: str, model_path: str, texts: List[str], batch_size: int, threads: int, queue) -> None:
+    torch.set_num_threads(threads)
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "right"
+        start = time.perf_counter()
+        backend = load_backend(name, model_path)
+        load_s = time.perf_counter() - start
+
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        # Warm-up pass; torch.compile and ONNX Runtime do their one-off work here.
+        encoded = tokenizer(batches[0], return_tensors="pt", padding=True)
+        backend.first_last(encoded["input_ids"], encoded["attention_mask"])
+
+        scores, timings = [], []
+        for batch in batches:
+            start = time.perf_counter()
+            encoded = tokenizer(batch, return_tensors="pt", padding=True)
+            first, last = backend.first_last(encoded["input_ids"], encoded["attention_mask"])
+            scores.extend(jensen_shannon_divergence(first, last, encoded["attention_mask"]).tolist())
+            timings.append((time.perf_counter() - start) * 1000.0)
+        queue.put({
+            "backend": name,
+            "load_s": load_s,
+            "p50_ms": percentile(timings, 0.50),
+            "p99_ms": percentile(timings, 0.99),
+            "peak_rss_mb": max_rss_mb(),
+            "scores": scores,
+        })
+    except Exception as exc:
+        queue.put({"backend": name, "error": f"{type(exc).__name__}: {exc}"})
+
+
+def run(names: List[str], model_path: str, texts: List[str], batch_size: int, threads: int) -> Dict[str, Dict]:
+    ctx = mp.get_context("spawn")
+    results = {}
+    for name in names:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_backend, args=(name, model_path, texts, batch_size, threads, queue))
+        proc.start()
+        results[name] = queue.get()
+        proc.join()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default="./model/Llama-3.2-1B-Instruct")
+    parser.add_argument("--data", default="data/alpaca_verb/instruction_alpaca.json")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--limit", type=int, default=50, help="number of instructions to score")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    parser.add_argument("--output", default=None, help="optionally write the raw results as JSON")
+    args = parser.parse_args()
+
+    texts = load_texts(args.data, args.limit)
+    names = ["eager"] + [name for name in args.backends if name != "eager"]
+    results = run(names, args.model_path, texts, args.batch_size, args.threads)
+    reference = results["eager"].get("scores")
+
+    print(f"{len(texts)} instructions, batch size {args.batch_size}, {args.threads} threads")
+    print(f"{'backend':>8} {'pearson':>8} {'max|dev|':>10} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'load s':>7}")
+    for name in names:
+        result = results[name]
+        if "error" in result:
+            print(f"{name:>8} failed: {result['error']}")
+            continue
+        scores = result["scores"]
+        if reference:
+            result["pearson"] = statistics.correlation(reference, scores) if len(scores) > 1 else 1.0
+            result["max_abs_dev"] = max(abs(a - b) for a, b in zip(reference, scores))
+        print(f"{name:>8} {result.get('pearson', float('nan')):>8.5f} {result.get('max_abs_dev', float('nan')):>10.4g} "
+              f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['peak_rss_mb']:>8.0f} {result['load_s']:>7.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
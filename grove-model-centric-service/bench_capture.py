@@ -0,0 +1,85 @@
+"""Peak RSS and latency of the lean and all-hidden-states capture modes.
+
+Each mode runs in a fresh process that loads the model, so peak RSS is the
+number that decides how many uvicorn workers fit on one box.
+
+    python bench_capture.py --model-path ./model/Llama-3.2-1B-Instruct --seq-lens 32 128 512
+"""
+import argparse
+import multiprocessing as mp
+import time
+from typing import Dict, List
+
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from bench_utils import max_rss_mb, percentile
+from capture import CAPTURE_MODES, first_last_hidden_states
+from divergence import jensen_shannon_divergence
+
+SAMPLE_TEXT = "tell me about the seasons in the temperate forest biome. "
+
+
+def _run_mode(model_path: str, mode: str, seq_lens: List[int], repeats: int, threads: int, queue) -> None:
+    torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = AutoModel.from_pretrained(model_path)
+    model.eval()
+    loaded_rss = max_rss_mb()
+
+    rows = []
+    for seq_len in seq_lens:
+        input_ids = tokenizer(SAMPLE_TEXT * seq_len, return_tensors="pt")["input_ids"][:, :seq_len]
+        timings = []
+        with torch.no_grad():
+            for _ in range(repeats + 1):
+                start = time.perf_counter()
+                first, last = first_last_hidden_states(model, input_ids, mode=mode)
+                score = jensen_shannon_divergence(first, last).item()
+                timings.append((time.perf_counter() - start) * 1000.0)
+        timings = timings[1:]
+        rows.append({
+            "seq_len": seq_len,
+            "p50_ms": percentile(timings, 0.50),
+            "p99_ms": percentile(timings, 0.99),
+            "peak_rss_mb": max_rss_mb(),
+            "score": score,
+        })
+    queue.put({"mode": mode, "loaded_rss_mb": loaded_rss, "rows": rows})
+
+
+def run(model_path: str, seq_lens: List[int], repeats: int, threads: int) -> Dict[str, Dict]:
+    ctx = mp.get_context("spawn")
+    results = {}
+    for mode in CAPTURE_MODES:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(model_path, mode, seq_lens, repeats, threads, queue))
+        proc.start()
+        results[mode] = queue.get()
+        proc.join()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default="./model/Llama-3.2-1B-Instruct")
+    parser.add_argument("--seq-lens", type=int, nargs="+", default=[32, 128, 512])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+
+    results = run(args.model_path, args.seq_lens, args.repeats, args.threads)
+    lean, full = results["lean"], results["all"]
+    print(f"model loaded RSS: lean {lean['loaded_rss_mb']:.0f} MB, all {full['loaded_rss_mb']:.0f} MB")
+    print(f"{'seq':>6} {'all p50':>9} {'lean p50':>9} {'all p99':>9} {'lean p99':>9} "
+          f"{'all RSS':>9} {'lean RSS':>9} {'|score diff|':>13}")
+    for full_row, lean_row in zip(full["rows"], lean["rows"]):
+        print(f"{full_row['seq_len']:>6} {full_row['p50_ms']:>9.1f} {lean_row['p50_ms']:>9.1f} "
+              f"{full_row['p99_ms']:>9.1f} {lean_row['p99_ms']:>9.1f} "
+              f"{full_row['peak_rss_mb']:>9.0f} {lean_row['peak_rss_mb']:>9.0f} "
+              f"{abs(full_row['score'] - lean_row['score']):>13.3g}")
+    print("Latency in ms, RSS is the cumulative peak in MB after each sequence length.")
+
+
+if __name__ == "__main__":
+    main()
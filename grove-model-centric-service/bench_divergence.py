@@ -0,0 +1,87 @@
+"""Microbenchmark of the legacy and fused Jensen-Shannon divergence kernels.
+
+Each (mode, batch, seq_len) case runs in a fresh process so the reported peak
+RSS delta only covers the kernel's own temporaries.
+
+    python bench_divergence.py --seq-lens 32 128 512 2048 --batch-sizes 1 8
+"""
+import argparse
+import multiprocessing as mp
+import statistics
+import time
+from typing import Dict, List
+
+import torch
+
+from bench_utils import max_rss_mb
+from divergence import MODES, jensen_shannon_divergence
+
+HIDDEN_SIZE = 2048  # Llama-3.2-1B
+
+
+def _run_case(mode: str, batch: int, seq_len: int, hidden: int, repeats: int, threads: int, queue) -> None:
+    torch.set_num_threads(threads)
+    torch.manual_seed(0)
+    logit1 = torch.randn(batch, seq_len, hidden)
+    logit2 = torch.randn(batch, seq_len, hidden)
+    mask = torch.ones(batch, seq_len, dtype=torch.long)
+    # Ragged batch: the i-th sequence loses i / batch of its tokens to padding.
+    for i in range(1, batch):
+        mask[i, seq_len - seq_len * i // batch:] = 0
+
+    baseline = max_rss_mb()
+    with torch.no_grad():
+        jensen_shannon_divergence(logit1, logit2, mask, mode=mode)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            jensen_shannon_divergence(logit1, logit2, mask, mode=mode)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    queue.put({
+        "mode": mode,
+        "batch": batch,
+        "seq_len": seq_len,
+        "median_ms": statistics.median(timings),
+        "peak_rss_delta_mb": max_rss_mb() - baseline,
+    })
+
+
+def run(seq_lens: List[int], batch_sizes: List[int], hidden: int, repeats: int, threads: int) -> List[Dict]:
+    ctx = mp.get_context("spawn")
+    results = []
+    for batch in batch_sizes:
+        for seq_len in seq_lens:
+            for mode in MODES:
+                queue = ctx.Queue()
+                proc = ctx.Process(target=_run_case, args=(mode, batch, seq_len, hidden, repeats, threads, queue))
+                proc.start()
+                results.append(queue.get())
+                proc.join()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seq-lens", type=int, nargs="+", default=[32, 128, 512, 2048])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--hidden", type=int, default=HIDDEN_SIZE)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+
+    results = run(args.seq_lens, args.batch_sizes, args.hidden, args.repeats, args.threads)
+    by_case = {(r["batch"], r["seq_len"], r["mode"]): r for r in results}
+
+    print(f"{'batch':>5} {'seq':>6} {'legacy ms':>10} {'fused ms':>10} {'speedup':>8} "
+          f"{'legacy MB':>10} {'fused MB':>10}")
+    for batch in args.batch_sizes:
+        for seq_len in args.seq_lens:
+            legacy = by_case[(batch, seq_len, "legacy")]
+            fused = by_case[(batch, seq_len, "fused")]
+            print(f"{batch:>5} {seq_len:>6} {legacy['median_ms']:>10.2f} {fused['median_ms']:>10.2f} "
+                  f"{legacy['median_ms'] / fused['median_ms']:>7.2f}x "
+                  f"{legacy['peak_rss_delta_mb']:>10.1f} {fused['peak_rss_delta_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import resource
+from typing import Dict, Sequence
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` for ``q`` in [0, 1]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def smaps_rollup_mb(pid: int) -> Dict[str, float]:
+    """``Rss``/``Pss``/``Shared_Clean``/``Private_Dirty`` of a live process in MiB (Linux only).
+
+    PSS splits each shared page evenly between the processes mapping it, so
+    summing it over workers gives their real combined footprint.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024.0
+    return {key: fields.get(key, 0.0) for key in ("Rss", "Pss", "Shared_Clean", "Private_Dirty")}
@@ -0,0 +1,99 @@
+"""Memory of N service workers with private vs memory-mapped model weights.
+
+Each worker is a spawned process that loads the inference backend the way
+a uvicorn worker does, scores one warm-up batch and then idles while RSS and
+PSS are read from /proc/<pid>/smaps_rollup. With ``mmap`` weights the
+per-worker PSS should shrink roughly by 1/N of the model size.
+
+The stock checkpoint is bfloat16, so fp32 backends get a private converted
+copy in every worker; point ``--mmap-model-path`` at a converted copy
+(``python shared_weights.py convert``) to compare against mapping that.
+
+    python bench_workers.py --model-path ./model/Llama-3.2-1B-Instruct \
+        --mmap-model-path ./model/Llama-3.2-1B-Instruct-fp32 --workers 1 2 4 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import time
+from typing import Dict, List
+
+import torch
+from transformers import AutoTokenizer
+
+from backends import BACKENDS, WEIGHT_MODES, load_backend
+from bench_utils import smaps_rollup_mb
+from divergence import jensen_shannon_divergence
+
+WARMUP_TEXT = "Give three tips for staying healthy."
+
+
+def _worker(backend: str, model_path: str, weights: str, threads: int, ready, stop) -> None:
+    torch.set_num_threads(threads)
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "right"
+    loaded = load_backend(backend, model_path, weights=weights)
+    encoded = tokenizer([WARMUP_TEXT], return_tensors="pt", padding=True)
+    first, last = loaded.first_last(encoded["input_ids"], encoded["attention_mask"])
+    score = jensen_shannon_divergence(first, last, encoded["attention_mask"]).item()
+    ready.put({"load_s": time.perf_counter() - start, "score": score})
+    stop.wait()
+
+
+def measure(backend: str, model_path: str, weights: str, workers: int, threads: int) -> Dict:
+    ctx = mp.get_context("spawn")
+    ready, stop = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(backend, model_path, weights, threads, ready, stop)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    try:
+        loads = [ready.get(timeout=600) for _ in procs]
+        memory = [smaps_rollup_mb(proc.pid) for proc in procs]
+    finally:
+        stop.set()
+        for proc in procs:
+            proc.join()
+    return {
+        "backend": backend,
+        "weights": weights,
+        "workers": workers,
+        "model_path": model_path,
+        "load_s_max": max(load["load_s"] for load in loads),
+        "scores_agree": len({round(load["score"], 6) for load in loads}) == 1,
+        "rss_mb_per_worker": sum(m["Rss"] for m in memory) / workers,
+        "pss_mb_per_worker": sum(m["Pss"] for m in memory) / workers,
+        "pss_mb_total": sum(m["Pss"] for m in memory),
+        "private_dirty_mb_per_worker": sum(m["Private_Dirty"] for m in memory) / workers,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default="./model/Llama-3.2-1B-Instruct")
+    parser.add_argument("--mmap-model-path", default=None, help="model directory for mmap weights (default: --model-path)")
+    parser.add_argument("--backend", default="eager", choices=list(BACKENDS))
+    parser.add_argument("--weights", nargs="+", default=list(WEIGHT_MODES), choices=list(WEIGHT_MODES))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    parser.add_argument("--output", default=None, help="optionally write the raw results as JSON")
+    args = parser.parse_args()
+
+    results: List[Dict] = []
+    print(f"{'weights':>8} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'PSS total':>10} {'dirty/worker':>13} {'load s':>7}")
+    for weights in args.weights:
+        for workers in args.workers:
+            model_path = args.mmap_model_path or args.model_path if weights == "mmap" else args.model_path
+            result = measure(args.backend, model_path, weights, workers, args.threads)
+            results.append(result)
+            print(f"{weights:>8} {workers:>7} {result['rss_mb_per_worker']:>11.0f} {result['pss_mb_per_worker']:>11.0f} "
+                  f"{result['pss_mb_total']:>10.0f} {result['private_dirty_mb_per_worker']:>13.0f} {result['load_s_max']:>7.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
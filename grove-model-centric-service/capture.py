@@ -0,0 +1,33 @@
+from typing import Optional, Tuple
+
+import torch
+from torch import nn
+
+CAPTURE_MODES = ("lean", "all")
+
+
+def first_last_hidden_states(
+    model: nn.Module,
+    input_ids: torch.Tensor,
+    attention_mask: Optional[torch.Tensor] = None,
+    mode: str = "lean",
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Run ``model`` and return ``(hidden_states[0], hidden_states[-1])``.
+
+    ``mode="all"`` asks the model for every layer's hidden states, which keeps
+    all of them alive until the forward pass returns. ``mode="lean"`` looks the
+    embeddings up itself and feeds them in as ``inputs_embeds``, then takes the
+    final (normed) layer from ``last_hidden_state``; each intermediate layer's
+    activations are released as soon as the next layer has consumed them.
+    Unlike a forward hook this holds no per-module state, so concurrent calls
+    on one model are safe.
+    """
+    if mode == "all":
+        outputs = model(input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True, use_cache=False)
+        return outputs.hidden_states[0], outputs.hidden_states[-1]
+    if mode != "lean":
+        raise ValueError(f"Unknown capture mode '{mode}', expected one of {CAPTURE_MODES}")
+
+    embeddings = model.get_input_embeddings()(input_ids)
+    outputs = model(inputs_embeds=embeddings, attention_mask=attention_mask, output_hidden_states=False, use_cache=False)
+    return embeddings, outputs.last_hidden_state
@@ -0,0 +1,88 @@
+import math
+from typing import Optional
+
+import torch
+
+EPSILON = 1e-8
+LOG_2 = math.log(2.0)
+
+MODES = ("fused", "legacy")
+
+
+def _padding_mask(logit: torch.Tensor, attention_mask: Optional[torch.Tensor]) -> Optional[torch.Tensor]:
+    """``[batch, seq, 1]`` mask that is True on padding, or None when nothing is padded."""
+    if attention_mask is None:
+        return None
+    padding = ~attention_mask.to(device=logit.device, dtype=torch.bool).unsqueeze(-1)
+    return padding if padding.any() else None
+
+
+def _mask_logits(logit: torch.Tensor, padding: Optional[torch.Tensor]) -> torch.Tensor:
+    return logit if padding is None else logit.masked_fill(padding, float("-inf"))
+
+
+def kl_divergence(p: torch.Tensor, q: torch.Tensor, epsilon: float = EPSILON) -> torch.Tensor:
+    """Per-sequence ``KL(p || q)`` of ``[batch, seq, hidden]`` probabilities, epsilon-smoothed."""
+    p = p + epsilon
+    q = q + epsilon
+    return torch.sum(p * (torch.log(p) - torch.log(q)), dim=(1, 2))
+
+
+def legacy_jensen_shannon_divergence(
+    logit1: torch.Tensor, logit2: torch.Tensor, attention_mask: Optional[torch.Tensor] = None
+) -> torch.Tensor:
+    """Original formulation: softmax, epsilon smoothing and ``torch.log``.
+
+    Kept for score compatibility; unpadded sequences reproduce the historical
+    single-sequence scores exactly.
+    """
+    padding = _padding_mask(logit1, attention_mask)
+    prob1 = torch.softmax(_mask_logits(logit1, padding), dim=1)
+    prob2 = torch.softmax(_mask_logits(logit2, padding), dim=1)
+
+    mid_prob = (prob1 + prob2) * 0.5
+
+    # Padding positions contribute epsilon * (log eps - log eps) == 0.
+    kl_div1 = kl_divergence(prob1, mid_prob)
+    kl_div2 = kl_divergence(prob2, mid_prob)
+    return (kl_div1 + kl_div2) * 0.5
+
+
+def fused_jensen_shannon_divergence(
+    logit1: torch.Tensor, logit2: torch.Tensor, attention_mask: Optional[torch.Tensor] = None
+) -> torch.Tensor:
+    """Log-space JSD without epsilon smoothing, reusing buffers in place."""
+    padding = _padding_mask(logit1, attention_mask)
+    log_p = torch.log_softmax(_mask_logits(logit1, padding), dim=1)
+    log_q = torch.log_softmax(_mask_logits(logit2, padding), dim=1)
+    log_m = torch.logaddexp(log_p, log_q).sub_(LOG_2)
+
+    # p * (log p - log m) + q * (log q - log m), accumulated into log_p.
+    p = log_p.exp()
+    log_p.sub_(log_m).mul_(p)
+    torch.exp(log_q, out=p)
+    log_q.sub_(log_m).mul_(p)
+    log_p.add_(log_q)
+    if padding is not None:
+        log_p.masked_fill_(padding, 0.0)
+    return log_p.sum(dim=(1, 2)).mul_(0.5)
+
+
+def jensen_shannon_divergence(
+    logit1: torch.Tensor,
+    logit2: torch.Tensor,
+    attention_mask: Optional[torch.Tensor] = None,
+    mode: str = "fused",
+) -> torch.Tensor:
+    """Per-sequence Jensen-Shannon divergence of two ``[batch, seq, hidden]`` tensors.
+
+    The distributions are taken over the sequence axis (``dim=1``) for each
+    hidden unit, as in the original scorer. ``attention_mask`` (``[batch,
+    seq]``) excludes padding from both the softmax and the sum. Returns a
+    ``[batch]`` tensor.
+    """
+    if mode == "fused":
+        return fused_jensen_shannon_divergence(logit1, logit2, attention_mask)
+    if mode == "legacy":
+        return legacy_jensen_shannon_divergence(logit1, logit2, attention_mask)
+    raise ValueError(f"Unknown divergence mode '{mode}', expected one of {MODES}")
@@ -1,84 +1,283 @@
-from fastapi import FastAPI, Body, HTTPException
+import time
+
+# Cold start is measured from here, before torch/transformers are imported.
+IMPORT_STARTED_AT = time.perf_counter()
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import os
+
+from fastapi import FastAPI, Body, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-import torch
-from torch import nn
-from transformers import AutoTokenizer, AutoModel
+from transformers import AutoTokenizer
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.decorator import cache
 import redis.asyncio as aioredis
 import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
+import metrics
+from batching import MicroBatcher
+from backends import load_backend
+from divergence import jensen_shannon_divergence
+from tiered_cache import LRUCache, SingleFlight, TieredBackend
+
+MODEL_PATH = os.getenv("VARIABILITY_MODEL_PATH", "./model/Llama-3.2-1B-Instruct")
+BATCH_MAX_SIZE = int(os.getenv("VARIABILITY_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("VARIABILITY_BATCH_MAX_WAIT_MS", "10"))
+# Same default as extract_variability.py, so both give a text the same score
+JSD_MODE = os.getenv("VARIABILITY_JSD_MODE", "legacy")
+CAPTURE_MODE = os.getenv("VARIABILITY_CAPTURE_MODE", "lean")
+INFERENCE_BACKEND = os.getenv("VARIABILITY_BACKEND", "eager")
+WEIGHTS_MODE = os.getenv("VARIABILITY_WEIGHTS", "private")
+BULK_MAX_ITEMS = int(os.getenv("VARIABILITY_BULK_MAX_ITEMS", "100000"))
+BULK_MAX_IN_FLIGHT = int(os.getenv("VARIABILITY_BULK_MAX_IN_FLIGHT", "16"))
+BULK_LOOKUP_CHUNK = int(os.getenv("VARIABILITY_BULK_LOOKUP_CHUNK", "1000"))
+REDIS_URL = os.getenv("VARIABILITY_REDIS_URL", "redis://localhost:6379")
+REDIS_TIMEOUT_S = float(os.getenv("VARIABILITY_REDIS_TIMEOUT_S", "0.5"))
+REDIS_RETRY_AFTER_S = float(os.getenv("VARIABILITY_REDIS_RETRY_AFTER_S", "5"))
+L1_MAX_ENTRIES = int(os.getenv("VARIABILITY_L1_MAX_ENTRIES", "100000"))
+INFERENCE_WORKERS = int(os.getenv("VARIABILITY_INFERENCE_WORKERS", "1"))
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+class ServiceNotReady(RuntimeError):
+    pass
+
 
 class VariabilityRequest(BaseModel):
     inputs: str
 
 
-def kl_divergence(p: torch.Tensor, q: torch.Tensor, epsilon: float = 1e-8) -> torch.Tensor:
-    p = p + epsilon
-    q = q + epsilon
-    return torch.sum(p * (torch.log(p) - torch.log(q)))
-
+class BulkVariabilityRequest(BaseModel):
+    inputs: List[str]
 
-def jensen_shannon_divergence(logit1: torch.Tensor, logit2: torch.Tensor) -> float:
-    softmax = nn.Softmax(dim=1)
-    prob1 = softmax(logit1)
-    prob2 = softmax(logit2)
 
-    mid_prob = (prob1 + prob2) * 0.5
+def input_digest(raw: str) -> str:
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
 
-    kl_div1 = kl_divergence(prob1, mid_prob)
-    kl_div2 = kl_divergence(prob2, mid_prob)
-    js_div = (kl_div1 + kl_div2) * 0.5
-    return js_div.item()
 
 def svc_key_builder(func, namespace: str, request=None, response=None, *args, **kwargs) -> str:
     raw = kwargs['kwargs']['inputs']
     if not raw or raw.isspace():
         raise ValueError("Input cannot be empty or contain only whitespace")
-    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    digest = input_digest(raw)
     return f"{namespace}:extract:{digest}"
 
 
 class VariabilityService:
-    def __init__(self, model_path: str = "./model/Llama-3.2-1B-Instruct") -> None:
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-        self.model = AutoModel.from_pretrained(model_path, output_hidden_states=True)
-        self.model.eval()
+    """Scores inputs once ``load()`` has run; cached scores are served before that."""
+
+    def __init__(self, model_path: str = MODEL_PATH) -> None:
+        self.model_path = model_path
+        self.tokenizer = None
+        self.backend = None
+        # Forward passes run here so the event loop keeps serving cache hits meanwhile.
+        self.executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="variability-inference")
+        self.batcher = MicroBatcher(
+            self.extract_batch,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            executor=self.executor,
+            concurrency=INFERENCE_WORKERS,
+        )
+        self.flights = SingleFlight()
+
+    @property
+    def ready(self) -> bool:
+        return self.backend is not None
+
+    def load(self) -> None:
+        started = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        # Right padding keeps the positions of real tokens identical to the unbatched pass.
+        tokenizer.padding_side = "right"
+        self.tokenizer = tokenizer
+        self.backend = load_backend(
+            INFERENCE_BACKEND, self.model_path, capture_mode=CAPTURE_MODE, weights=WEIGHTS_MODE
+        )
+        metrics.MODEL_LOAD_SECONDS.set(time.perf_counter() - started)
+
+    def extract_batch(self, inputs: List[str]) -> List[float]:
+        with metrics.timed("tokenize"):
+            encoded = self.tokenizer(inputs, return_tensors="pt", padding=True)
+        metrics.observe_batch(encoded["attention_mask"].sum(dim=1).tolist())
+        with metrics.timed("forward"):
+            first_layer_logits, last_layer_logits = self.backend.first_last(encoded["input_ids"], encoded["attention_mask"])
+        with metrics.timed("divergence"):
+            scores = jensen_shannon_divergence(first_layer_logits, last_layer_logits, encoded["attention_mask"], mode=JSD_MODE)
+            return scores.tolist()
 
     @cache(expire=None, key_builder=svc_key_builder)
     async def extract(self, inputs: str) -> float:
-        input_ids = self.tokenizer(inputs, return_tensors="pt", padding=True)["input_ids"]
-        with torch.no_grad():
-            outputs = self.model(input_ids)
-        first_layer_logits = outputs.hidden_states[0]
-        last_layer_logits = outputs.hidden_states[-1]
-        return jensen_shannon_divergence(first_layer_logits, last_layer_logits)
+        if not self.ready:
+            if startup["error"] is not None:
+                raise ServiceNotReady(f"Model failed to load: {startup['error']}")
+            raise ServiceNotReady("Model is still loading")
+        # Identical inputs that miss the cache together share one forward pass.
+        return await self.flights.run(input_digest(inputs), lambda: self.batcher.submit(inputs))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    redis = aioredis.from_url("redis://localhost:6379")
-    FastAPICache.init(RedisBackend(redis), prefix="grove:model-centric:variability")
+    redis = aioredis.from_url(REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT_S, socket_timeout=REDIS_TIMEOUT_S)
+    backend = TieredBackend(l1_cache, RedisBackend(redis), retry_after_s=REDIS_RETRY_AFTER_S)
+    try:
+        await redis.ping()
+    except Exception as e:
+        backend.mark_degraded(e)
+    FastAPICache.init(backend, prefix="grove:model-centric:variability")
+    # Load in the background so the worker accepts connections (and serves cache hits) right away.
+    # A load still running at shutdown is abandoned with the executor; from_pretrained cannot be interrupted.
+    asyncio.get_running_loop().run_in_executor(service.executor, load_service)
     try:
         yield
     finally:
+        await service.batcher.close()
+        service.executor.shutdown(wait=False, cancel_futures=True)
         await redis.close()
 
 
 app = FastAPI(lifespan=lifespan)
 service = VariabilityService()
+startup: Dict[str, Any] = {"cold_start_seconds": None, "error": None}
+l1_cache = LRUCache(max_entries=L1_MAX_ENTRIES)
+# Shared by every bulk request so large jobs cannot crowd single-item callers out of the batcher.
+bulk_slots = asyncio.Semaphore(BULK_MAX_IN_FLIGHT)
+
+
+def load_service() -> None:
+    try:
+        service.load()
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+        logger.exception("Failed to load the variability model")
+        return
+    startup["cold_start_seconds"] = time.perf_counter() - IMPORT_STARTED_AT
+    metrics.COLD_START_SECONDS.set(startup["cold_start_seconds"])
+    logger.info("Ready to serve after %.1fs (import to ready)", startup["cold_start_seconds"])
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> List[str]:
+    """Read bulk inputs from a JSON body or a JSONL upload.
+
+    JSON bodies are ``{"inputs": [...]}`` or a bare list; JSONL lines are
+    either a JSON string or an object with an ``inputs`` field.
+    """
+    if content_type.split(";")[0].strip().lower() in NDJSON_MEDIA_TYPES:
+        items: List[Any] = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        return BulkVariabilityRequest(inputs=[item["inputs"] if isinstance(item, dict) else item for item in items]).inputs
+    data = json.loads(body)
+    if isinstance(data, list):
+        data = {"inputs": data}
+    return BulkVariabilityRequest(**data).inputs
+
+
+async def lookup_cached(keys: List[str]) -> List[Optional[float]]:
+    """Fetch cached scores for ``keys`` in a single round trip where possible."""
+    backend = FastAPICache.get_backend()
+    coder = FastAPICache.get_coder()
+    try:
+        if isinstance(backend, TieredBackend):
+            values = await backend.get_many(keys)
+        else:
+            values = [await backend.get(key) for key in keys]
+    except Exception:
+        return [None] * len(keys)
+    return [None if value is None else coder.decode(value) for value in values]
+
+
+def bulk_line(index: int, dec_score: Optional[float], cached: bool, error: Optional[str] = None) -> str:
+    line: Dict[str, Any] = {"index": index, "dec_score": dec_score, "cached": cached}
+    if error is not None:
+        line["error"] = error
+    return json.dumps(line) + "\n"
+
+
+async def stream_bulk(inputs: List[str]) -> AsyncIterator[str]:
+    with metrics.in_flight("bulk"):
+        async for line in _stream_bulk(inputs):
+            yield line
+
+
+async def _stream_bulk(inputs: List[str]) -> AsyncIterator[str]:
+    namespace = f"{FastAPICache.get_prefix()}:"
+    done: "asyncio.Queue[List[str]]" = asyncio.Queue()
+    in_flight: Dict[str, List[int]] = {}
+    tasks = set()
+
+    async def score(key: str, text: str) -> None:
+        try:
+            dec_score = await service.extract(inputs=text)
+            lines = [bulk_line(i, dec_score, False) for i in in_flight.pop(key)]
+        except Exception as e:
+            lines = [bulk_line(i, None, False, str(e)) for i in in_flight.pop(key)]
+        done.put_nowait(lines)
+
+    def release(task: "asyncio.Task") -> None:
+        tasks.discard(task)
+        bulk_slots.release()
+
+    try:
+        for start in range(0, len(inputs), BULK_LOOKUP_CHUNK):
+            chunk = inputs[start:start + BULK_LOOKUP_CHUNK]
+            keys: List[Optional[str]] = []
+            for offset, text in enumerate(chunk):
+                try:
+                    keys.append(svc_key_builder(None, namespace, kwargs={"inputs": text}))
+                except ValueError as e:
+                    keys.append(None)
+                    yield bulk_line(start + offset, None, False, str(e))
+            valid = [key for key in keys if key is not None]
+            cached = dict(zip(valid, await lookup_cached(valid))) if valid else {}
+
+            for offset, (text, key) in enumerate(zip(chunk, keys)):
+                if key is None:
+                    continue
+                if cached[key] is not None:
+                    yield bulk_line(start + offset, cached[key], True)
+                elif key in in_flight:
+                    in_flight[key].append(start + offset)
+                else:
+                    while in_flight and bulk_slots.locked():
+                        for line in await done.get():
+                            yield line
+                    await bulk_slots.acquire()
+                    in_flight[key] = [start + offset]
+                    task = asyncio.create_task(score(key, text))
+                    tasks.add(task)
+                    task.add_done_callback(release)
+                while not done.empty():
+                    for line in done.get_nowait():
+                        yield line
+
+        while in_flight or not done.empty():
+            for line in await done.get():
+                yield line
+    finally:
+        for task in list(tasks):
+            task.cancel()
 
 
 @app.post("/v1/model-centric/llama-3.2-1b-instruct/variability/extract")
 async def extract_variability(req: VariabilityRequest = Body(...)):
     try:
-        dec_score = await service.extract(inputs=req.inputs)
+        with metrics.in_flight("extract"):
+            dec_score = await service.extract(inputs=req.inputs)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return {
         "code": "OK",
         "message": "Success",
@@ -86,6 +285,60 @@ async def extract_variability(req: VariabilityRequest = Body(...)):
     }
 
 
+@app.post("/v1/model-centric/llama-3.2-1b-instruct/variability/extract/bulk")
+async def extract_variability_bulk(request: Request):
+    try:
+        inputs = parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bulk request body: {e}")
+    if len(inputs) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} inputs per request")
+    return StreamingResponse(stream_bulk(inputs), media_type="application/x-ndjson")
+
+
+@app.get("/v1/model-centric/llama-3.2-1b-instruct/variability/batcher/stats")
+async def batcher_stats():
+    return {
+        "code": "OK",
+        "message": "Success",
+        "data": service.batcher.stats.snapshot(),
+    }
+
+
+@app.get("/v1/model-centric/llama-3.2-1b-instruct/variability/cache/stats")
+async def cache_stats():
+    backend = FastAPICache.get_backend()
+    data = backend.stats() if isinstance(backend, TieredBackend) else {}
+    data["single_flight"] = service.flights.stats()
+    return {
+        "code": "OK",
+        "message": "Success",
+        "data": data,
+    }
+
+
+@app.get("/ready")
+async def readiness():
+    data = {"ready": service.ready, **startup}
+    if startup["error"] is not None:
+        # The load is not retried, so this worker never becomes ready; report why instead of "still loading"
+        raise HTTPException(status_code=500, detail={"message": f"Model failed to load: {startup['error']}", **data})
+    if not service.ready:
+        raise HTTPException(status_code=503, detail={"message": "Model is still loading", **data})
+    return {
+        "code": "OK",
+        "message": "Ready",
+        "data": data,
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (VARIABILITY_METRICS=0)")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 def get_app() -> FastAPI:
     return app
 
@@ -0,0 +1,98 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+ENABLED = os.getenv("VARIABILITY_METRICS", "1").lower() not in ("0", "false", "no", "off")
+
+registry = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    "variability_stage_seconds",
+    "Time spent in each stage of variability extraction.",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    registry=registry,
+)
+CACHE_LOOKUPS = Counter(
+    "variability_cache_lookups_total",
+    "Cache lookups by tier and result.",
+    ["tier", "result"],
+    registry=registry,
+)
+INPUT_TOKENS = Histogram(
+    "variability_input_tokens",
+    "Token length of each scored input.",
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+    registry=registry,
+)
+BATCH_SIZE = Histogram(
+    "variability_batch_size",
+    "Number of inputs per forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+    registry=registry,
+)
+IN_FLIGHT = Gauge(
+    "variability_in_flight_requests",
+    "Requests currently being served, by endpoint.",
+    ["endpoint"],
+    registry=registry,
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "variability_model_load_seconds",
+    "Time taken to load the tokenizer and model.",
+    registry=registry,
+)
+COLD_START_SECONDS = Gauge(
+    "variability_cold_start_seconds",
+    "Time from importing main.py until the service was ready to score.",
+    registry=registry,
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def in_flight(endpoint: str) -> Iterator[None]:
+    if not ENABLED:
+        yield
+        return
+    gauge = IN_FLIGHT.labels(endpoint)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def count_lookup(tier: str, hits: int, misses: int) -> None:
+    if not ENABLED:
+        return
+    if hits:
+        CACHE_LOOKUPS.labels(tier, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(tier, "miss").inc(misses)
+
+
+def observe_batch(token_lengths: List[int]) -> None:
+    if not ENABLED:
+        return
+    BATCH_SIZE.observe(len(token_lengths))
+    for length in token_lengths:
+        INPUT_TOKENS.observe(length)
+
+
+def render() -> bytes:
+    return generate_latest(registry)
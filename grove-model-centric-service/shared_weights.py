@@ -0,0 +1,166 @@
+"""Zero-copy, memory-mapped model weights that uvicorn workers can share.
+
+``load_mmap_model`` builds the model skeleton on the meta device and points
+every parameter straight at a read-only (copy-on-write) mapping of the
+safetensors files. All workers on a host then share the same page-cache
+pages instead of each holding a private copy.
+
+Sharing only holds while the compute dtype equals the dtype stored on disk;
+Llama-3.2-1B-Instruct ships bfloat16 weights, so either run the bf16 backend
+or write an fp32 copy once:
+
+    python shared_weights.py convert ./model/Llama-3.2-1B-Instruct ./model/Llama-3.2-1B-Instruct-fp32
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import struct
+from typing import Dict, Optional
+
+import torch
+from torch import nn
+from transformers import AutoConfig, AutoModel
+
+logger = logging.getLogger(__name__)
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def mmap_safetensors(path: str) -> Dict[str, torch.Tensor]:
+    """Tensors of one safetensors file as views into a private mapping of it.
+
+    Nothing is read up front; pages are faulted in from the page cache on
+    first use and stay shared with every other process mapping the file for
+    as long as nobody writes to them.
+    """
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    data = torch.empty(0, dtype=torch.uint8).set_(storage)
+    start = 8 + header_size
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        begin, end = info["data_offsets"]
+        raw = data[start + begin:start + end]
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        if (start + begin) % dtype.itemsize:
+            # Misaligned for a zero-copy view; fall back to a private copy of this tensor.
+            raw = raw.clone()
+        tensors[name] = raw.view(dtype).reshape(info["shape"])
+    return tensors
+
+
+def _materialize_meta_buffers(model: nn.Module) -> None:
+    """Rebuild non-persistent buffers (e.g. rotary ``inv_freq``) that are not in the checkpoint."""
+    for module in model.modules():
+        meta_buffers = [name for name, buf in module.named_buffers(recurse=False) if buf.is_meta]
+        if not meta_buffers:
+            continue
+        try:
+            fresh = type(module)(config=model.config)
+        except TypeError as exc:
+            raise RuntimeError(f"Cannot rebuild buffers {meta_buffers} of {type(module).__name__}") from exc
+        for name in meta_buffers:
+            setattr(module, name, getattr(fresh, name))
+        for name, value in vars(fresh).items():
+            if not name.startswith("_") and not isinstance(value, (nn.Module, torch.Tensor)):
+                setattr(module, name, value)
+
+
+def load_mmap_model(model_path: str, dtype: Optional[torch.dtype] = None) -> nn.Module:
+    """``AutoModel`` whose parameters are zero-copy views of the safetensors files in ``model_path``."""
+    files = sorted(glob.glob(os.path.join(model_path, "*.safetensors")))
+    if not files:
+        raise FileNotFoundError(f"No .safetensors files in {model_path}")
+    state: Dict[str, torch.Tensor] = {}
+    for path in files:
+        state.update(mmap_safetensors(path))
+
+    config = AutoConfig.from_pretrained(model_path)
+    dtype = dtype or next(iter(state.values())).dtype
+    with torch.device("meta"):
+        # ``dtype=`` needs transformers 4.56+ (older releases only know ``torch_dtype``); requirements.txt pins it
+        model = AutoModel.from_config(config, dtype=dtype)
+
+    # Causal-LM checkpoints prefix the base model's keys, e.g. "model.layers.0...".
+    expected = set(model.state_dict())
+    prefix = model.base_model_prefix + "."
+    state = {
+        (name[len(prefix):] if name not in expected and name.startswith(prefix) else name): tensor
+        for name, tensor in state.items()
+    }
+    state = {name: tensor for name, tensor in state.items() if name in expected}
+    stored = {tensor.dtype for tensor in state.values() if tensor.is_floating_point()}
+    if stored - {dtype}:
+        logger.warning(
+            "Weights in %s are stored as %s but %s was requested; they are converted into private memory "
+            "and will not be shared. Run 'python shared_weights.py convert' to write a matching copy.",
+            model_path, sorted(str(d) for d in stored), dtype,
+        )
+        state = {name: tensor.to(dtype) if tensor.is_floating_point() else tensor for name, tensor in state.items()}
+    missing = expected - set(state)
+    if missing:
+        raise RuntimeError(f"Checkpoint in {model_path} is missing {sorted(missing)[:5]}")
+
+    model.load_state_dict(state, assign=True)
+    _materialize_meta_buffers(model)
+    model.eval()
+    return model
+
+
+def convert(src: str, dst: str, dtype: torch.dtype) -> None:
+    """Copy a model directory with its weights cast to ``dtype`` so they can be mapped without conversion."""
+    from safetensors.torch import save_file
+
+    os.makedirs(dst, exist_ok=True)
+    for path in glob.glob(os.path.join(src, "*")):
+        name = os.path.basename(path)
+        if name.endswith(".safetensors"):
+            tensors = {key: tensor.to(dtype).contiguous() for key, tensor in mmap_safetensors(path).items()}
+            save_file(tensors, os.path.join(dst, name), metadata={"format": "pt"})
+        elif os.path.isfile(path):
+            shutil.copy2(path, os.path.join(dst, name))
+    config_path = os.path.join(dst, "config.json")
+    if os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        name = str(dtype).replace("torch.", "")
+        config["torch_dtype"] = name
+        if "dtype" in config:
+            config["dtype"] = name
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prepare model weights for memory-mapped sharing.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="write a copy of a model directory in another dtype")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument("--dtype", default="float32", choices=("float32", "bfloat16", "float16"))
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.src, args.dst, getattr(torch, args.dtype))
+
+
+if __name__ == "__main__":
+    main()
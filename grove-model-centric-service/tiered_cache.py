@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.types import Backend
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Bounded in-process cache of encoded values, evicting least recently used keys."""
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            self._discard(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return 0, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        value, expires_at = entry
+        return (-1 if expires_at is None else int(expires_at - time.monotonic())), value
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_with_ttl(key)[1]
+
+    def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        self._discard(key)
+        expires_at = time.monotonic() + expire if expire else None
+        self._entries[key] = (value, expires_at)
+        self.nbytes += len(key) + len(value)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._discard(key)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= len(key) + len(entry[0])
+
+    def clear(self, prefix: Optional[str] = None) -> int:
+        keys = [key for key in self._entries if prefix is None or key.startswith(prefix)]
+        for key in keys:
+            self._discard(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-progress computation.
+
+    The computation runs as its own task, so a caller that disconnects does
+    not cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, "asyncio.Task[Any]"] = {}
+        self.leaders = 0
+        self.joined = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.joined += 1
+        return await asyncio.shield(flight)
+
+    def _land(self, key: str, flight: "asyncio.Task[Any]") -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Retrieve the exception so it is not reported as never awaited.
+            flight.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._flights), "leaders": self.leaders, "joined": self.joined}
+
+
+class TieredBackend(Backend):
+    """fastapi-cache backend with an in-process LRU in front of Redis.
+
+    Reads are served from the LRU first and Redis hits are copied into it;
+    writes go to both. When Redis errors, the backend logs once and keeps
+    serving from the LRU alone, retrying Redis after ``retry_after_s``.
+    """
+
+    def __init__(self, l1: LRUCache, redis: Optional[RedisBackend] = None, retry_after_s: float = 5.0) -> None:
+        self.l1 = l1
+        self.redis = redis
+        self.retry_after_s = retry_after_s
+        self._degraded_until = 0.0
+        self.redis_errors = 0
+
+    @property
+    def degraded(self) -> bool:
+        return self.redis is None or time.monotonic() < self._degraded_until
+
+    def mark_degraded(self, exc: BaseException) -> None:
+        self.redis_errors += 1
+        if not self.degraded:
+            logger.warning("Redis unavailable, serving from the in-process cache only: %s", exc)
+        self._degraded_until = time.monotonic() + self.retry_after_s
+
+    async def _redis_call(self, fn: Callable[[], Awaitable[Any]]) -> Tuple[bool, Any]:
+        if self.degraded:
+            return False, None
+        try:
+            return True, await fn()
+        except Exception as exc:
+            self.mark_degraded(exc)
+            return False, None
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        with metrics.timed("cache_lookup"):
+            ttl, value = self.l1.get_with_ttl(key)
+            metrics.count_lookup("l1", value is not None, value is None)
+            if value is not None:
+                return ttl, value
+            ok, found = await self._redis_call(lambda: self.redis.get_with_ttl(key))
+            if not ok:
+                return 0, None
+            metrics.count_lookup("redis", found[1] is not None, found[1] is None)
+            if found[1] is None:
+                return 0, None
+            ttl, value = found
+            self.l1.set(key, value, ttl if ttl > 0 else None)
+            return ttl, value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_with_ttl(key))[1]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Look ``keys`` up in the LRU, then fetch the rest from Redis with one MGET."""
+        with metrics.timed("cache_lookup"):
+            values = [self.l1.get(key) for key in keys]
+            missing = [i for i, value in enumerate(values) if value is None]
+            metrics.count_lookup("l1", len(keys) - len(missing), len(missing))
+            if missing:
+                ok, found = await self._redis_call(lambda: self.redis.redis.mget([keys[i] for i in missing]))
+                if ok:
+                    for i, value in zip(missing, found):
+                        if value is not None:
+                            self.l1.set(keys[i], value)
+                            values[i] = value
+                    redis_hits = sum(value is not None for value in found)
+                    metrics.count_lookup("redis", redis_hits, len(missing) - redis_hits)
+            return values
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        self.l1.set(key, value, expire)
+        await self._redis_call(lambda: self.redis.set(key, value, expire))
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if key is not None:
+            self.l1.delete(key)
+        else:
+            self.l1.clear(namespace)
+        ok, cleared = await self._redis_call(lambda: self.redis.clear(namespace, key))
+        return cleared if ok else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "l1": self.l1.stats(),
+            "redis": {"degraded": self.degraded, "errors": self.redis_errors},
+        }
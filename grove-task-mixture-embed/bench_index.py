@@ -0,0 +1,254 @@
+"""Index layout benchmark: build time, loaded memory, recall@k and QPS against brute force.
+
+Vectors (and, with --scalar, the text fields) are copied out of an
+existing collection, by default the alpaca one. A held-out set of them
+becomes the queries. Every index configuration is built on a fresh
+scratch collection and searched one query at a time. Recall@k is
+measured against exact top-k computed with NumPy.
+
+    python bench_index.py --limit 50000 --queries 500 --k 10 \\
+        --index FLAT HNSW 'HNSW:{"M": 32, "ef": 128}' IVF_FLAT IVF_PQ AUTOINDEX --output bench_index.json
+    python bench_index.py --limit 20000 --index HNSW --scalar none all
+
+An index is written TYPE or TYPE:{json params}; "ef" and "nprobe" are
+search params, everything else is a build param. --scalar compares
+VARCHAR index layouts ("none", "all" or comma-separated field names) on
+collections that carry the text fields.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+import indexes
+from embed_instruction_alpaca import SPEC
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` for ``q`` in [0, 1]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_index(value: str) -> Tuple[str, Dict[str, Any]]:
+    index_type, _, raw = value.partition(":")
+    return index_type.upper(), json.loads(raw) if raw else {}
+
+
+def read_collection(name: str, limit: int, text_fields: List[str]) -> Tuple[np.ndarray, Dict[str, List[str]]]:
+    """``limit`` vectors (and text columns) of an existing collection, read in pages."""
+    collection = Collection(name)
+    collection.load()
+    vector_field = next(f.name for f in collection.schema.fields if f.dtype == DataType.FLOAT_VECTOR)
+    iterator = collection.query_iterator(batch_size=1000, limit=limit or -1, expr="", output_fields=[vector_field, *text_fields])
+    vectors: List[List[float]] = []
+    texts: Dict[str, List[str]] = {f: [] for f in text_fields}
+    while True:
+        page = iterator.next()
+        if not page:
+            break
+        for row in page:
+            vectors.append(row[vector_field])
+            for f in text_fields:
+                texts[f].append(row.get(f) or "")
+    iterator.close()
+    return np.asarray(vectors, dtype=np.float32), texts
+
+
+def brute_force(base: np.ndarray, queries: np.ndarray, k: int, metric: str, chunk: int = 128) -> np.ndarray:
+    """Exact top-k ids of ``queries`` in ``base`` under ``metric``."""
+    if metric == "COSINE":
+        base = base / np.maximum(np.linalg.norm(base, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    out = []
+    for start in range(0, len(queries), chunk):
+        q = queries[start:start + chunk]
+        if metric == "L2":
+            scores = -(np.sum(q ** 2, axis=1, keepdims=True) - 2 * q @ base.T + np.sum(base ** 2, axis=1))
+        else:
+            scores = q @ base.T
+        top = np.argpartition(-scores, k, axis=1)[:, :k]
+        out.append(np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1))
+    return np.concatenate(out)
+
+
+def loaded_memory_mb(name: str) -> float:
+    return sum(getattr(s, "mem_size", 0) for s in utility.get_query_segment_info(name)) / 2**20
+
+
+def build_case(
+    name: str,
+    base: np.ndarray,
+    texts: Dict[str, List[str]],
+    index_type: str,
+    overrides: Dict[str, Any],
+    metric: str,
+    scalar: Tuple[str, ...],
+) -> Dict[str, Any]:
+    dim = base.shape[1]
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dim),
+    ]
+    fields += [
+        FieldSchema(name=f.name, dtype=DataType.VARCHAR, max_length=f.max_length) for f in SPEC.fields if f.name in texts
+    ]
+    collection = Collection(name=name, schema=CollectionSchema(fields=fields, description="index benchmark scratch"))
+
+    batch = 500 if texts else 2000
+    start = time.perf_counter()
+    for lo in range(0, len(base), batch):
+        hi = min(lo + batch, len(base))
+        collection.insert([list(range(lo, hi)), base[lo:hi].tolist(), *[texts[f.name][lo:hi] for f in SPEC.fields if f.name in texts]])
+    collection.flush()
+    insert_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    collection.create_index(
+        field_name="vector", index_name="idx_vector", index_params=indexes.vector_index_params(index_type, metric, dim, overrides)
+    )
+    utility.wait_for_index_building_complete(name, index_name="idx_vector")
+    vector_build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for field in scalar:
+        collection.create_index(field_name=field, index_name=f"idx_{field}", index_params={"index_type": "AUTOINDEX", "params": {}})
+        utility.wait_for_index_building_complete(name, index_name=f"idx_{field}")
+    scalar_build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    collection.load()
+    load_s = time.perf_counter() - start
+    return {
+        "collection": collection,
+        "insert_s": round(insert_s, 3),
+        "vector_build_s": round(vector_build_s, 3),
+        "scalar_build_s": round(scalar_build_s, 3),
+        "load_s": round(load_s, 3),
+        "loaded_mb": round(loaded_memory_mb(name), 1),
+    }
+
+
+def search_case(
+    collection: Collection,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+    index_type: str,
+    overrides: Dict[str, Any],
+    metric: str,
+) -> Dict[str, Any]:
+    params = indexes.search_params(index_type, metric, queries.shape[1], overrides)
+    # Warm-up, so the first timed query does not pay for lazy loading
+    collection.search(queries[:1].tolist(), "vector", params, limit=k)
+    latencies = []
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        result = collection.search([query.tolist()], "vector", params, limit=k)
+        latencies.append(time.perf_counter() - t0)
+        hits += len(set(result[0].ids) & set(expected.tolist()))
+    elapsed = time.perf_counter() - start
+    return {
+        f"recall@{k}": round(hits / (k * len(queries)), 4),
+        "qps": round(len(queries) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", default=os.getenv("MILVUS_COLLECTION", SPEC.name), help="collection to copy vectors from")
+    parser.add_argument("--limit", type=int, default=50000, help="vectors to copy (queries are taken from these)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", default=os.getenv("VECTOR_METRIC", SPEC.metric))
+    parser.add_argument("--index", nargs="+", default=["FLAT", "AUTOINDEX", "HNSW", "IVF_FLAT", "IVF_PQ"])
+    parser.add_argument("--scalar", nargs="+", default=None, help="VARCHAR index layouts to compare (copies the text fields)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collections")
+    parser.add_argument("--milvus-host", default=os.getenv("MILVUS_HOST", "localhost"))
+    parser.add_argument("--milvus-port", type=int, default=int(os.getenv("MILVUS_PORT", "19530")))
+    parser.add_argument("--output", default=None, help="optionally write the results as JSON")
+    args = parser.parse_args()
+
+    connections.connect(host=args.milvus_host, port=args.milvus_port)
+    field_names = [f.name for f in SPEC.fields]
+    layouts: List[Optional[str]] = args.scalar or [None]
+    text_fields = field_names if args.scalar else []
+
+    start = time.perf_counter()
+    vectors, texts = read_collection(args.collection, args.limit, text_fields)
+    print(f"Read {len(vectors)} vectors from '{args.collection}' in {time.perf_counter() - start:.1f}s")
+    if len(vectors) <= args.queries + args.k:
+        raise SystemExit(f"Need more than {args.queries + args.k} vectors, got {len(vectors)}")
+
+    # Held-out queries: they are searched for but never inserted
+    order = np.random.default_rng(args.seed).permutation(len(vectors))
+    query_rows, base_rows = order[:args.queries], np.sort(order[args.queries:])
+    queries, base = vectors[query_rows], vectors[base_rows]
+    texts = {f: [column[i] for i in base_rows] for f, column in texts.items()}
+    del vectors
+
+    start = time.perf_counter()
+    truth = brute_force(base, queries, args.k, args.metric)
+    brute_s = time.perf_counter() - start
+    print(f"Brute force top-{args.k} for {len(queries)} queries over {len(base)} vectors: {brute_s:.1f}s "
+          f"({len(queries) / brute_s:.1f} QPS single-threaded NumPy)")
+
+    results = []
+    for raw_index in args.index:
+        index_type, overrides = parse_index(raw_index)
+        for layout in layouts:
+            scalar = indexes.parse_scalar_indexes(layout, field_names) if layout is not None else ()
+            name = f"bench_index_{index_type.lower()}_{len(results)}"
+            build = build_case(name, base, texts, index_type, overrides, args.metric, scalar)
+            collection = build.pop("collection")
+            search = search_case(collection, queries, truth, args.k, index_type, overrides, args.metric)
+            build_params, search_params = indexes.split_params(index_type, base.shape[1], overrides)
+            result = {
+                "index": index_type,
+                "build_params": build_params,
+                "search_params": search_params,
+                "scalar_indexes": list(scalar),
+                **build,
+                **search,
+            }
+            results.append(result)
+            print(
+                f"{index_type:>10} {json.dumps({**build_params, **search_params}):<40} scalar={layout or '-':<6} "
+                f"build {build['vector_build_s']:.1f}s+{build['scalar_build_s']:.1f}s, {build['loaded_mb']:.0f} MiB, "
+                f"recall@{args.k} {search[f'recall@{args.k}']:.3f}, {search['qps']:.0f} QPS, p99 {search['p99_ms']:.1f} ms"
+            )
+            if not args.keep:
+                utility.drop_collection(name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "source": args.collection,
+                    "vectors": len(base),
+                    "queries": len(queries),
+                    "k": args.k,
+                    "metric": args.metric,
+                    "brute_force_s": round(brute_s, 3),
+                },
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
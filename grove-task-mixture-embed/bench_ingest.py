@@ -0,0 +1,453 @@
+"""Ingestion throughput benchmark against local stand-ins.
+
+Synthetic instruction datasets are ingested with the same batching,
+embedding and commit code as ``embed_instruction_alpaca.py``, while
+sweeping batch size, concurrency and flush policy. The embedder is the
+in-process hash backend or the OpenAI-compatible stub server. The target
+is the local Milvus from ``milvus_v2.6.2-docker-compose`` or, when none
+is reachable, an in-process fake collection.
+
+Every case runs in a fresh subprocess, so peak RSS is per case. Results
+(rows/sec, p50/p99 batch latency, peak RSS) go to a JSON file tagged
+with the git commit; ``compare`` lines up two such files.
+
+    python bench_ingest.py generate --rows 10000 100000 1000000
+    python bench_ingest.py sweep --rows 100000 --batch-size 256 1024 2048 --concurrency 1 4 8 \\
+        --flush-every 1 0 --embedder stub --stub-latency-ms 150 --output bench_results.json
+    python bench_ingest.py compare bench_before.json bench_results.json
+
+Concurrency 1 runs the serial loop; higher values run the pipeline.
+Flush policy is FLUSH_EVERY_ROWS: 1 flushes after every batch (the
+original loop), 0 only at the end, N every N rows.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import ingest
+from checkpoint import Committer
+from embed_instruction_alpaca import SPEC
+from embedders import HashEmbedder, OpenAIEmbedder
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data")
+
+VERBS = ["write", "explain", "summarize", "classify", "translate", "rewrite", "list", "describe", "compare", "generate"]
+NOUNS = [
+    "story", "email", "recipe", "poem", "report", "review", "function", "dialogue", "plan", "essay",
+    "headline", "tweet", "question", "definition", "argument", "outline", "letter", "joke", "riddle", "summary",
+]
+WORDS = (
+    "the a an of to in for on with about from by as is are was be this that these those it they we you "
+    "model data system user task result value number time people world city river market energy health "
+    "school music history science language computer network garden ocean planet winter summer coffee "
+    "quickly carefully simple clear short long formal friendly detailed brief important useful"
+).split()
+CONSTRAINTS = ["", "", "Use at most 50 words.", "Answer in bullet points.", "Do not use the letter e.", "Use a formal tone."]
+
+
+# ======== Dataset ========
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_record(rng: random.Random) -> Dict[str, str]:
+    instruction = f"{rng.choice(VERBS).capitalize()} a {rng.choice(NOUNS)} about {rng.choice(WORDS)} {rng.choice(WORDS)}."
+    text_input = _sentence(rng, 0, 40) if rng.random() < 0.6 else ""
+    constraint = rng.choice(CONSTRAINTS)
+    output = " ".join(_sentence(rng, 6, 24) for _ in range(rng.randint(1, 8)))
+    inputs = "\n".join(part for part in (instruction, text_input, constraint) if part)
+    return {"instruction": instruction, "input": text_input, "constraint": constraint, "output": output, "inputs": inputs}
+
+
+def dataset_path(rows: int, seed: int = 0) -> str:
+    return os.path.join(DATA_DIR, f"instruction_{rows}_seed{seed}.jsonl")
+
+
+def generate(rows: int, seed: int = 0, force: bool = False) -> str:
+    """Write ``rows`` synthetic instruction records as JSONL (reused when already present)."""
+    path = dataset_path(rows, seed)
+    if os.path.exists(path) and not force:
+        return path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    rng = random.Random(seed)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for _ in range(rows):
+            f.write(json.dumps(synthetic_record(rng), ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+# ======== Insert targets ========
+
+
+class FakeCollection:
+    """In-process stand-in for a pymilvus Collection: checks column alignment and simulates call latency.
+
+    Vectors are not kept, so memory reflects the ingestion code rather than
+    the target. Every flush seals a segment, as it does in Milvus.
+    """
+
+    def __init__(self, dim: int, insert_ms: float = 5.0, flush_ms: float = 200.0) -> None:
+        self.dim = dim
+        self.insert_ms = insert_ms
+        self.flush_ms = flush_ms
+        self.rows = 0
+        self.keys = set()
+        self.segments = 0
+        self.growing = 0
+        self.lock = threading.Lock()
+
+    def _write(self, entities: List[List[Any]]) -> int:
+        n = len(entities[0])
+        if any(len(column) != n for column in entities):
+            raise ValueError(f"Misaligned columns: {[len(c) for c in entities]}")
+        time.sleep(self.insert_ms / 1000)
+        with self.lock:
+            self.growing += n
+        return n
+
+    def insert(self, entities: List[List[Any]]) -> None:
+        vectors = entities[0]
+        if vectors and len(vectors[0]) != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors, got {len(vectors[0])}-d")
+        n = self._write(entities)
+        with self.lock:
+            self.rows += n
+
+    def upsert(self, entities: List[List[Any]]) -> None:
+        keys = entities[0]
+        self._write(entities)
+        with self.lock:
+            self.keys.update(keys)
+            self.rows = len(self.keys)
+
+    def flush(self) -> None:
+        time.sleep(self.flush_ms / 1000)
+        with self.lock:
+            if self.growing:
+                self.segments += 1
+                self.growing = 0
+
+    def load(self) -> None:
+        pass
+
+
+def milvus_reachable(host: str, port: int, timeout: float = 3.0) -> bool:
+    try:
+        from pymilvus import connections
+
+        connections.connect(alias="bench_probe", host=host, port=port, timeout=timeout)
+        connections.disconnect("bench_probe")
+        return True
+    except Exception:
+        return False
+
+
+# ======== One case ========
+
+
+class TimedCommitter(Committer):
+    """Committer that records each batch's latency from being read to being committed.
+
+    Both ingest loops commit batches in the order they were read, so a FIFO
+    of read times is enough to pair them up.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.read_at: deque = deque()
+        self.latencies: List[float] = []
+
+    def track(self, batches: Iterable[Any]) -> Iterator[Any]:
+        for batch in batches:
+            self.read_at.append(time.perf_counter())
+            yield batch
+
+    def committed(self, rows: int, byte_offset: Optional[int] = None) -> None:
+        super().committed(rows, byte_offset)
+        self.latencies.append(time.perf_counter() - self.read_at.popleft())
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` for ``q`` in [0, 1]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    if case["embedder"] == "stub":
+        backend = OpenAIEmbedder("text-embedding-3-small", base_url=case["stub_url"])
+    else:
+        backend = HashEmbedder()
+    name = f"bench_ingest_{os.getpid()}"
+    spec = ingest.CollectionSpec(name, SPEC.description, SPEC.fields, SPEC.embed_source, dim=backend.dim)
+    config = ingest.IngestConfig(
+        batch_size=case["batch_size"],
+        concurrency=case["concurrency"],
+        pipeline=case["concurrency"] > 1,
+        rpm=0,
+        tpm=0,
+        cache=False,
+        upsert=case["upsert"],
+        flush_every=case["flush_every"],
+    )
+
+    if case["target"] == "milvus":
+        from pymilvus import connections, utility
+
+        connections.connect(alias="default", host=case["milvus_host"], port=case["milvus_port"])
+        collection = ingest.ensure_collection(spec, auto_id=not config.upsert)
+    else:
+        collection = FakeCollection(backend.dim, case["fake_insert_ms"], case["fake_flush_ms"])
+
+    committer = TimedCommitter(collection, flush_every=config.flush_every)
+    records = ingest.json_reader(spec)(case["path"], None, 0)
+    if config.upsert:
+        records = ingest.with_keys(spec, records)
+    guard = ingest.OverflowGuard(
+        spec, ingest.TokenCounter(config.embedding_model), config.max_input_tokens,
+        path=os.path.join(tempfile.gettempdir(), f"{name}.overflow.jsonl"),
+    )
+    batches = committer.track(ingest.pack_batches(records, guard, case["batch_tokens"] or float("inf"), config.batch_size))
+
+    start = time.perf_counter()
+    try:
+        if config.pipeline:
+            ingest.ingest_pipelined(backend, collection, spec, config, batches, None, committer)
+        else:
+            ingest.ingest_serial(collection, spec, batches, backend, config.upsert, committer)
+        wall_s = time.perf_counter() - start
+        if case["target"] == "milvus":
+            from checkpoint import segment_count
+
+            collection.load()
+            segments = segment_count(name)
+        else:
+            segments = collection.segments
+    finally:
+        guard.close()
+        if case["target"] == "milvus":
+            utility.drop_collection(name)
+
+    return {
+        **{k: v for k, v in case.items() if k not in ("path", "stub_url")},
+        "rows_ingested": committer.offset,
+        "wall_s": round(wall_s, 3),
+        "rows_per_sec": round(committer.offset / wall_s, 1) if wall_s else 0.0,
+        "batches": len(committer.latencies),
+        "batch_p50_ms": round(percentile(committer.latencies, 0.50) * 1000, 2),
+        "batch_p99_ms": round(percentile(committer.latencies, 0.99) * 1000, 2),
+        "flushes": committer.flushes,
+        "segments": segments,
+        "peak_rss_mb": round(max_rss_mb(), 1),
+    }
+
+
+# ======== Sweep and comparison ========
+
+
+def git_revision() -> Dict[str, Any]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=here, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def run_in_subprocess(case: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile("r", suffix=".json") as result:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "once", "--case", json.dumps(case), "--result", result.name],
+            check=True,
+            stdout=None if verbose else subprocess.DEVNULL,
+        )
+        return json.load(result)
+
+
+def case_key(run: Dict[str, Any]) -> tuple:
+    return tuple(run.get(k) for k in ("rows", "batch_size", "concurrency", "flush_every", "upsert", "embedder", "target"))
+
+
+def sweep(args: argparse.Namespace) -> None:
+    target = args.target
+    if target == "auto":
+        target = "milvus" if milvus_reachable(args.milvus_host, args.milvus_port) else "fake"
+        print(f"Insert target: {target}")
+
+    server = None
+    stub_url = None
+    if args.embedder == "stub":
+        from stub_server import StubConfig, serve_in_thread
+
+        # The stub runs in this process, so its memory does not count towards the cases' RSS
+        stub = StubConfig(latency_ms=args.stub_latency_ms, per_input_ms=args.stub_per_input_ms, jitter_ms=args.stub_jitter_ms)
+        server, stub_url = serve_in_thread(stub)
+
+    runs = []
+    try:
+        for rows, batch_size, concurrency, flush_every in itertools.product(
+            args.rows, args.batch_size, args.concurrency, args.flush_every
+        ):
+            case = {
+                "rows": rows,
+                "batch_size": batch_size,
+                "batch_tokens": args.batch_tokens,
+                "concurrency": concurrency,
+                "flush_every": flush_every,
+                "upsert": args.upsert,
+                "embedder": args.embedder,
+                "target": target,
+                "fake_insert_ms": args.fake_insert_ms,
+                "fake_flush_ms": args.fake_flush_ms,
+                "milvus_host": args.milvus_host,
+                "milvus_port": args.milvus_port,
+                "path": generate(rows, args.seed),
+                "stub_url": stub_url,
+            }
+            for repeat in range(args.repeat):
+                result = run_in_subprocess(case, args.verbose)
+                result["repeat"] = repeat
+                runs.append(result)
+                print(
+                    f"rows={rows} batch={batch_size} conc={concurrency} flush={flush_every}: "
+                    f"{result['rows_per_sec']:.0f} rows/s, p99 {result['batch_p99_ms']:.0f} ms, "
+                    f"peak RSS {result['peak_rss_mb']:.0f} MiB, {result['segments']} segments"
+                )
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "stub": {
+                "latency_ms": args.stub_latency_ms,
+                "per_input_ms": args.stub_per_input_ms,
+                "jitter_ms": args.stub_jitter_ms,
+            } if args.embedder == "stub" else None,
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(runs)} runs to {args.output}")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)
+
+    def best(runs: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+        # Repeats of one case are reduced to the fastest
+        out: Dict[tuple, Dict[str, Any]] = {}
+        for run in runs:
+            key = case_key(run)
+            if key not in out or run["rows_per_sec"] > out[key]["rows_per_sec"]:
+                out[key] = run
+        return out
+
+    old, new = best(before["runs"]), best(after["runs"])
+    print(f"before {before['meta'].get('commit', '?')[:10]}  after {after['meta'].get('commit', '?')[:10]}")
+    print(f"{'rows':>8} {'batch':>6} {'conc':>5} {'flush':>6} {'rows/s':>17} {'p99 ms':>17} {'RSS MiB':>15} {'speedup':>8}")
+    for key in sorted(set(old) & set(new), key=lambda k: tuple(str(v) for v in k)):
+        a, b = old[key], new[key]
+        speedup = b["rows_per_sec"] / a["rows_per_sec"] if a["rows_per_sec"] else 0.0
+        print(
+            f"{key[0]:>8} {key[1]:>6} {key[2]:>5} {key[3]:>6} "
+            f"{a['rows_per_sec']:>8.0f} {b['rows_per_sec']:>8.0f} "
+            f"{a['batch_p99_ms']:>8.0f} {b['batch_p99_ms']:>8.0f} "
+            f"{a['peak_rss_mb']:>7.0f} {b['peak_rss_mb']:>7.0f} {speedup:>7.2f}x"
+        )
+    unmatched = len(set(old) ^ set(new))
+    if unmatched:
+        print(f"{unmatched} cases appear in only one file")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="write synthetic datasets")
+    gen.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--force", action="store_true", help="regenerate existing files")
+
+    sw = sub.add_parser("sweep", help="run the benchmark grid")
+    sw.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    sw.add_argument("--batch-size", type=int, nargs="+", default=[64, 512, 2048])
+    sw.add_argument("--batch-tokens", type=int, default=0, help="token budget per batch (0 = rows only)")
+    sw.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    sw.add_argument("--flush-every", type=int, nargs="+", default=[1, 0])
+    sw.add_argument("--upsert", action="store_true", help="upsert with content keys instead of auto-id inserts")
+    sw.add_argument("--embedder", choices=("hash", "stub"), default="hash")
+    sw.add_argument("--stub-latency-ms", type=float, default=100.0)
+    sw.add_argument("--stub-per-input-ms", type=float, default=0.05)
+    sw.add_argument("--stub-jitter-ms", type=float, default=20.0)
+    sw.add_argument("--target", choices=("auto", "milvus", "fake"), default="auto")
+    sw.add_argument("--milvus-host", default=os.getenv("MILVUS_HOST", "localhost"))
+    sw.add_argument("--milvus-port", type=int, default=int(os.getenv("MILVUS_PORT", "19530")))
+    sw.add_argument("--fake-insert-ms", type=float, default=5.0, help="simulated latency per insert call")
+    sw.add_argument("--fake-flush-ms", type=float, default=200.0, help="simulated latency per flush")
+    sw.add_argument("--repeat", type=int, default=1)
+    sw.add_argument("--seed", type=int, default=0)
+    sw.add_argument("--verbose", action="store_true", help="show the ingest loops' own output")
+    sw.add_argument("--output", default="bench_ingest_results.json")
+
+    cmp_ = sub.add_parser("compare", help="compare two results files")
+    cmp_.add_argument("before")
+    cmp_.add_argument("after")
+
+    once = sub.add_parser("once", help=argparse.SUPPRESS)
+    once.add_argument("--case", required=True)
+    once.add_argument("--result", required=True)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        for rows in args.rows:
+            start = time.perf_counter()
+            path = generate(rows, args.seed, args.force)
+            print(f"{path} ({os.path.getsize(path) / 2**20:.1f} MiB, {time.perf_counter() - start:.1f}s)")
+    elif args.command == "sweep":
+        sweep(args)
+    elif args.command == "compare":
+        compare(args.before, args.after)
+    else:
+        result = run_case(json.loads(args.case))
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
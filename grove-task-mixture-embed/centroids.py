@@ -0,0 +1,102 @@
+"""Per-group centroids kept in a small companion collection.
+
+The task-mixture service needs the mean seed-sentence vector of each
+``type``. Instead of paging every row out of Milvus to average them, the
+ingestion writes one row per group to ``<collection>_centroid``:
+
+  id         content key of the group value
+  <group>    the group value (e.g. the seed type)
+  count      rows averaged
+  norm       L2 norm of the mean vector (1.0 = all members identical, lower = more spread)
+  mean_norm  average L2 norm of the member vectors
+  vector     the mean vector, always float32 whatever the main collection stores
+
+Centroids are averaged from the float32 embeddings, so they are exact
+even when the main collection holds float16 or binary vectors.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from checkpoint import content_key
+
+CENTROID_SUFFIX = "_centroid"
+
+
+class CentroidAccumulator:
+    """Running per-group vector sums and counts (float64, so long groups do not drift)."""
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self.sums: Dict[str, np.ndarray] = {}
+        self.counts: Dict[str, int] = {}
+        self.norm_sums: Dict[str, float] = {}
+
+    def add(self, groups: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not len(vectors):
+            return
+        array = np.asarray(vectors, dtype=np.float64)
+        norms = np.linalg.norm(array, axis=1)
+        for group, vector, norm in zip(groups, array, norms):
+            if group not in self.sums:
+                self.sums[group] = np.zeros(self.dim, dtype=np.float64)
+                self.counts[group] = 0
+                self.norm_sums[group] = 0.0
+            self.sums[group] += vector
+            self.counts[group] += 1
+            self.norm_sums[group] += float(norm)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        out = []
+        for group in sorted(self.sums):
+            count = self.counts[group]
+            mean = self.sums[group] / count
+            out.append({
+                "group": group,
+                "count": count,
+                "norm": float(np.linalg.norm(mean)),
+                "mean_norm": self.norm_sums[group] / count,
+                "vector": mean.astype(np.float32).tolist(),
+            })
+        return out
+
+
+def write_centroids(name: str, group_field: str, dim: int, metric: str, rows: List[Dict[str, Any]]):
+    """Replace the companion collection ``name`` with ``rows``; it is small, so it is rebuilt whole."""
+    from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name=group_field, dtype=DataType.VARCHAR, max_length=512),
+        FieldSchema(name="count", dtype=DataType.INT64),
+        FieldSchema(name="norm", dtype=DataType.FLOAT),
+        FieldSchema(name="mean_norm", dtype=DataType.FLOAT),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dim),
+    ]
+    schema = CollectionSchema(fields=fields, description=f"Per-{group_field} centroids")
+    collection = Collection(name=name, schema=schema)
+    if rows:
+        collection.insert([
+            [content_key([r["group"]]) for r in rows],
+            [r["group"] for r in rows],
+            [r["count"] for r in rows],
+            [r["norm"] for r in rows],
+            [r["mean_norm"] for r in rows],
+            [r["vector"] for r in rows],
+        ])
+    collection.flush()
+    collection.create_index(
+        field_name="vector",
+        index_params={"index_type": "AUTOINDEX", "metric_type": metric, "params": {}},
+    )
+    collection.load()
+    return collection
+
+
+def summary(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"Centroids: {len(rows)} groups"]
+    for r in rows:
+        lines.append(f"  {r['group']}: {r['count']} rows, centroid norm {r['norm']:.3f}, mean norm {r['mean_norm']:.3f}")
+    return "\n".join(lines)
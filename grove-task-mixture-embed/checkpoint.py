@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+MAX_INT64 = 0x7FFF_FFFF_FFFF_FFFF
+
+
+def content_key(values: Sequence[Any]) -> int:
+    """Deterministic non-negative INT64 primary key derived from a row's source fields."""
+    payload = json.dumps(list(values), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(payload).digest()[:8], "big") & MAX_INT64
+
+
+def dedupe_by_key(keys: List[int], columns: List[List[Any]]) -> List[List[Any]]:
+    """Keep the last row for each primary key so one upsert never carries the same key twice."""
+    last = {key: i for i, key in enumerate(keys)}
+    if len(last) == len(keys):
+        return [keys, *columns]
+    keep = sorted(last.values())
+    return [[keys[i] for i in keep], *[[column[i] for i in keep] for column in columns]]
+
+
+def source_fingerprint(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+class Checkpoint:
+    """Last committed row offset of one source -> collection ingestion, written atomically.
+
+    Rows are upserted under content-derived keys, so replaying the rows
+    after the recorded offset is harmless; the offset only saves work.
+    ``byte_offset``, when the reader provides one, lets a rerun seek
+    straight to the next row instead of re-parsing the skipped ones.
+    """
+
+    def __init__(self, path: str, collection: str, source: str) -> None:
+        self.path = path
+        self.identity = {"collection": collection, **source_fingerprint(source)}
+        self.offset = 0
+        self.byte_offset: Optional[int] = None
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if any(saved.get(key) != value for key, value in self.identity.items()):
+            print(f"Checkpoint {self.path} is for a different source or collection; starting from row 0")
+            return 0
+        self.offset = int(saved.get("offset", 0))
+        self.byte_offset = saved.get("byte_offset")
+        return self.offset
+
+    def save(self, offset: int, flushed: Optional[bool] = None, byte_offset: Optional[int] = None) -> None:
+        self.offset = offset
+        self.byte_offset = byte_offset
+        state = {**self.identity, "offset": offset}
+        if byte_offset is not None:
+            state["byte_offset"] = byte_offset
+        if flushed is not None:
+            state["flushed"] = flushed
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def segment_count(collection_name: str) -> int:
+    """Number of loaded segments of a collection, as reported by the query nodes."""
+    from pymilvus import utility
+
+    return len(utility.get_query_segment_info(collection_name))
+
+
+class Committer:
+    """Flush policy plus checkpointing after each written batch.
+
+    ``flush_every`` is a row count: 0 flushes only in ``finish``, 1 flushes
+    after every batch (the original behaviour). The checkpoint offset is
+    saved after every batch, flushed or not.
+    """
+
+    def __init__(
+        self,
+        collection,
+        checkpoint: Optional[Checkpoint] = None,
+        flush_every: int = 0,
+        offset: int = 0,
+        byte_offset: Optional[int] = None,
+    ) -> None:
+        self.collection = collection
+        self.checkpoint = checkpoint
+        self.flush_every = flush_every
+        self.offset = offset
+        self.byte_offset = byte_offset
+        self.unflushed = 0
+        self.flushes = 0
+
+    def committed(self, rows: int, byte_offset: Optional[int] = None) -> None:
+        self.offset += rows
+        self.byte_offset = byte_offset
+        self.unflushed += rows
+        flushed = False
+        if self.flush_every and self.unflushed >= self.flush_every:
+            self.flush()
+            flushed = True
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.offset, flushed, self.byte_offset)
+
+    def flush(self) -> None:
+        self.collection.flush()
+        self.unflushed = 0
+        self.flushes += 1
+
+    def finish(self) -> None:
+        if self.unflushed or not self.flushes:
+            self.flush()
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.offset, True, self.byte_offset)
@@ -0,0 +1,136 @@
+"""Embedding backends selected with ``EMBED_BACKEND``.
+
+  openai  OpenAI (or any OpenAI-compatible server via OPENAI_BASE_URL)
+  local   a sentence-embedding model run on CPU with transformers
+  hash    deterministic feature hashing, no model and no network (tests, benchmarks)
+
+Every backend is a callable ``texts -> vectors`` with a ``model_id`` (used
+as the embedding cache key, so vectors of different backends never mix)
+and a ``dim``.
+"""
+import hashlib
+import math
+import os
+import re
+from typing import List, Optional
+
+BACKENDS = ("openai", "local", "hash")
+
+OPENAI_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder:
+    model_id: str
+    dim: int
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class OpenAIEmbedder(Embedder):
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None) -> None:
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        if not api_key:
+            if not base_url:
+                raise RuntimeError(
+                    "OpenAI API Key is missing. Set OPENAI_API_KEY, or OPENAI_BASE_URL for a compatible server."
+                )
+            # Local OpenAI-compatible servers (e.g. stub_server.py) do not check the key
+            api_key = "unused"
+        try:
+            from openai import OpenAI  # type: ignore
+        except Exception as exc:  # pragma: no cover
+            raise RuntimeError("openai package is required. Install via 'pip install openai'.") from exc
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.model = model
+        self.model_id = model
+        self.dim = OPENAI_DIMS.get(model, 1536)
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        vectors: List[List[float]] = [None] * len(texts)  # type: ignore
+        for i, item in enumerate(response.data):
+            # Place each vector by the index the API reports, not by arrival order
+            vectors[getattr(item, "index", i)] = item.embedding  # type: ignore
+        if any(v is None for v in vectors):
+            raise RuntimeError(f"Embedding response is missing vectors for {vectors.count(None)} of {len(texts)} inputs")
+        return vectors
+
+
+class LocalEmbedder(Embedder):
+    """Mean-pooled, L2-normalized hidden states of a transformers encoder, on CPU."""
+
+    def __init__(self, model: str = DEFAULT_LOCAL_MODEL, max_length: int = 512, threads: int = 0) -> None:
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except Exception as exc:  # pragma: no cover
+            raise RuntimeError("torch and transformers are required. Install via 'pip install torch transformers'.") from exc
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        self.model = AutoModel.from_pretrained(model).eval()
+        self.max_length = max_length
+        self.model_id = f"local:{model}"
+        self.dim = int(self.model.config.hidden_size)
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        torch = self.torch
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            hidden = self.model(**encoded).last_hidden_state
+        mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1)
+        return torch.nn.functional.normalize(pooled, dim=-1).tolist()
+
+
+class HashEmbedder(Embedder):
+    """Signed feature hashing of words and character trigrams, L2-normalized.
+
+    The same text always gets the same vector, and texts sharing words
+    score a higher cosine similarity, which is enough for ingestion and
+    search plumbing tests.
+    """
+
+    def __init__(self, dim: int = 1536) -> None:
+        self.dim = dim
+        self.model_id = f"hash:{dim}"
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        words = _WORD.findall(text.lower())
+        features = words + [w[i:i + 3] for w in words for i in range(max(1, len(w) - 2))]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if not norm:
+            # Empty or punctuation-only text still gets a valid unit vector
+            vector[0], norm = 1.0, 1.0
+        return [v / norm for v in vector]
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(t) for t in texts]
+
+
+def load_embedder(backend: Optional[str] = None, model: Optional[str] = None, dim: Optional[int] = None) -> Embedder:
+    """Build the backend named by ``backend`` (default: EMBED_BACKEND, then "openai")."""
+    backend = (backend or os.getenv("EMBED_BACKEND", "openai")).lower()
+    if backend == "openai":
+        return OpenAIEmbedder(model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
+    if backend == "local":
+        return LocalEmbedder(
+            model or os.getenv("LOCAL_EMBED_MODEL", DEFAULT_LOCAL_MODEL),
+            threads=int(os.getenv("LOCAL_EMBED_THREADS", "0")),
+        )
+    if backend == "hash":
+        return HashEmbedder(dim or int(os.getenv("VECTOR_DIM", "1536")))
+    raise ValueError(f"EMBED_BACKEND must be one of {BACKENDS}, got '{backend}'")
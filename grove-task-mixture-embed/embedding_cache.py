@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+DEFAULT_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache.sqlite"),
+)
+LOOKUP_CHUNK = 500
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache in SQLite keyed by (model, sha256(text)); vectors are float32 blobs."""
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash BLOB NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash)"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[bytes, bytes] = {}
+        with self.lock:
+            for start in range(0, len(hashes), LOOKUP_CHUNK):
+                chunk = hashes[start:start + LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                )
+                found.update(rows)
+        out = [unpack(found[h]) if h in found else None for h in hashes]
+        hits = sum(v is not None for v in out)
+        with self.lock:
+            self.hits += hits
+            self.misses += len(out) - hits
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        rows = [(model, text_hash(t), len(v), pack(v)) for t, v in zip(texts, vectors)]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+            self.written += len(rows)
+
+    def vectors(self, model: str, limit: int = 0) -> List[List[float]]:
+        """Up to ``limit`` cached vectors of ``model`` (all when 0), in text-hash order."""
+        query = "SELECT vector FROM embeddings WHERE model = ?" + (" LIMIT ?" if limit else "")
+        with self.lock:
+            rows = self.conn.execute(query, [model, limit] if limit else [model]).fetchall()
+        return [unpack(blob) for blob, in rows]
+
+    def stats(self) -> Dict[str, object]:
+        with self.lock:
+            per_model = self.conn.execute(
+                "SELECT model, COUNT(*), SUM(LENGTH(vector)) FROM embeddings GROUP BY model ORDER BY model"
+            ).fetchall()
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "written": self.written,
+            "entries": sum(count for _, count, _ in per_model),
+            "bytes": sum(size or 0 for _, _, size in per_model),
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "models": {model: {"entries": count, "bytes": size or 0} for model, count, size in per_model},
+        }
+
+    def prune(self, keep_models: Iterable[str]) -> int:
+        """Delete entries of every model not in ``keep_models`` and compact the file."""
+        keep = list(keep_models)
+        placeholders = ",".join("?" * len(keep))
+        where = f"WHERE model NOT IN ({placeholders})" if keep else ""
+        with self.lock:
+            deleted = self.conn.execute(f"DELETE FROM embeddings {where}", keep).rowcount
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+        return deleted
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class CachedEmbedder:
+    """Wraps an embedding function with the on-disk cache and de-duplication.
+
+    Each unique text is embedded at most once per run: cached texts are
+    served from disk, repeats inside a batch share one request slot, and a
+    text already being embedded by another thread is awaited rather than
+    requested again.
+    """
+
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]], model: str, cache: Optional[EmbeddingCache] = None) -> None:
+        self.embed = embed
+        self.model = model
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, "Future[List[float]]"] = {}
+        self.requested = 0
+        self.deduplicated = 0
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        unique = list(dict.fromkeys(texts))
+        vectors: Dict[str, List[float]] = {}
+        owned: Dict[str, "Future[List[float]]"] = {}
+        waiting: Dict[str, "Future[List[float]]"] = {}
+        # Lookup and claim under one lock, so a text finished by another thread in between is not requested twice.
+        with self.lock:
+            self.deduplicated += len(texts) - len(unique)
+            if self.cache is not None:
+                for text, vector in zip(unique, self.cache.get_many(self.model, unique)):
+                    if vector is not None:
+                        vectors[text] = vector
+            for text in unique:
+                if text in vectors:
+                    continue
+                if text in self.in_flight:
+                    waiting[text] = self.in_flight[text]
+                else:
+                    owned[text] = self.in_flight[text] = Future()
+
+        if owned:
+            # Finish our own request before waiting on others', so threads never wait on each other in a cycle.
+            missing = list(owned)
+            try:
+                embedded = self.embed(missing)
+                if self.cache is not None:
+                    self.cache.put_many(self.model, missing, embedded)
+                for text, vector in zip(missing, embedded):
+                    owned[text].set_result(vector)
+                    vectors[text] = vector
+            except BaseException as exc:
+                for future in owned.values():
+                    if not future.done():
+                        future.set_exception(exc)
+                raise
+            finally:
+                # Only forget the claims once the vectors are in the cache, so late callers find them there.
+                with self.lock:
+                    for text in missing:
+                        self.in_flight.pop(text, None)
+                    self.requested += len(missing)
+        for text, future in waiting.items():
+            vectors[text] = future.result()
+        return [vectors[t] for t in texts]
+
+    def summary(self) -> str:
+        line = f"Embedding: {self.requested} texts requested, {self.deduplicated} duplicates skipped"
+        if self.cache is not None:
+            stats = self.cache.stats()
+            line += (
+                f", cache {stats['hits']} hits / {stats['misses']} misses ({stats['hit_ratio']:.1%}),"
+                f" {stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MiB"
+            )
+        return line
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or prune the local embedding cache.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="entries and bytes per model")
+    prune = sub.add_parser("prune", help="delete entries of models not listed in --keep")
+    # Deleting everything must be asked for explicitly, not left to an empty --keep
+    which = prune.add_mutually_exclusive_group(required=True)
+    which.add_argument("--keep", nargs="+", help="model names to keep")
+    which.add_argument("--all", action="store_true", help="delete every entry")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.path)
+    if args.command == "prune":
+        print(f"Deleted {cache.prune([] if args.all else args.keep)} entries")
+    stats = cache.stats()
+    print(f"{stats['path']}: {stats['entries']} entries, {stats['bytes']} vector bytes, {stats['file_bytes']} file bytes")
+    for model, info in stats["models"].items():
+        print(f"  {model}: {info['entries']} entries, {info['bytes']} bytes")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Vector and scalar index layout for the ingestion collections.
+
+The vector index is chosen with ``VECTOR_INDEX`` and tuned with
+``VECTOR_INDEX_PARAMS`` (JSON, merged over the defaults below):
+
+    VECTOR_INDEX=HNSW VECTOR_INDEX_PARAMS='{"M": 32, "efConstruction": 256}'
+    VECTOR_INDEX=IVF_PQ VECTOR_INDEX_PARAMS='{"nlist": 2048, "m": 96}'
+
+``SCALAR_INDEXES`` lists the VARCHAR fields to index ("all", "none" or
+comma-separated names); by default only the fields a spec marks as
+filtered on are indexed. Existing indexes are never dropped, so a layout
+change applies to collections created after it.
+"""
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+VECTOR_INDEXES = ("AUTOINDEX", "FLAT", "HNSW", "IVF_FLAT", "IVF_PQ", "BIN_FLAT", "BIN_IVF_FLAT")
+BINARY_INDEXES = ("BIN_FLAT", "BIN_IVF_FLAT")
+
+# index type -> (build params, search params)
+DEFAULT_PARAMS: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {
+    "AUTOINDEX": ({}, {}),
+    "FLAT": ({}, {}),
+    "HNSW": ({"M": 16, "efConstruction": 200}, {"ef": 64}),
+    "IVF_FLAT": ({"nlist": 1024}, {"nprobe": 16}),
+    "IVF_PQ": ({"nlist": 1024, "nbits": 8}, {"nprobe": 16}),
+    "BIN_FLAT": ({}, {}),
+    "BIN_IVF_FLAT": ({"nlist": 1024}, {"nprobe": 16}),
+}
+SEARCH_KEYS = ("ef", "nprobe")
+
+
+def pq_subvectors(dim: int) -> int:
+    """IVF_PQ ``m``: about 16 dimensions per sub-quantizer, and it must divide ``dim``."""
+    m = max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def split_params(index_type: str, dim: int, overrides: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Build and search params for ``index_type``: defaults, then ``overrides`` (search keys go to search)."""
+    if index_type not in DEFAULT_PARAMS:
+        raise ValueError(f"VECTOR_INDEX must be one of {VECTOR_INDEXES}, got '{index_type}'")
+    build, search = (dict(p) for p in DEFAULT_PARAMS[index_type])
+    if index_type == "IVF_PQ":
+        build["m"] = pq_subvectors(dim)
+    for key, value in (overrides or {}).items():
+        (search if key in SEARCH_KEYS else build)[key] = value
+    if index_type == "IVF_PQ" and dim % int(build["m"]):
+        raise ValueError(f"IVF_PQ m={build['m']} must divide the vector dimension {dim}")
+    return build, search
+
+
+def vector_index_params(index_type: str, metric: str, dim: int, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    build, _ = split_params(index_type, dim, overrides)
+    return {"index_type": index_type, "metric_type": metric, "params": build}
+
+
+def search_params(index_type: str, metric: str, dim: int, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    _, search = split_params(index_type, dim, overrides)
+    return {"metric_type": metric, "params": search}
+
+
+def vector_index_from_env(default: str, vector_type: str) -> Tuple[str, Dict[str, Any]]:
+    index_type = os.getenv("VECTOR_INDEX", default).upper()
+    if vector_type == "binary" and index_type not in BINARY_INDEXES:
+        # Binary vectors only take the BIN_* indexes
+        index_type = "BIN_FLAT"
+    raw = os.getenv("VECTOR_INDEX_PARAMS")
+    try:
+        overrides = json.loads(raw) if raw else {}
+    except ValueError as exc:
+        raise ValueError(f"VECTOR_INDEX_PARAMS is not valid JSON: {raw!r}") from exc
+    return index_type, overrides
+
+
+def scalar_indexes_from_env(field_names, default) -> Tuple[str, ...]:
+    """Names of the VARCHAR fields to index: SCALAR_INDEXES if set, else ``default``."""
+    raw = os.getenv("SCALAR_INDEXES")
+    return tuple(default) if raw is None else parse_scalar_indexes(raw, field_names)
+
+
+def parse_scalar_indexes(raw: str, field_names) -> Tuple[str, ...]:
+    """``"all"``, ``"none"`` or comma-separated field names -> the field names to index."""
+    if raw.strip().lower() == "all":
+        return tuple(field_names)
+    if raw.strip().lower() in ("", "none"):
+        return ()
+    wanted = tuple(name.strip() for name in raw.split(",") if name.strip())
+    unknown = set(wanted) - set(field_names)
+    if unknown:
+        raise ValueError(f"SCALAR_INDEXES names unknown fields {sorted(unknown)}; fields are {list(field_names)}")
+    return wanted
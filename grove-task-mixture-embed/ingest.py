@@ -0,0 +1,571 @@
+"""Schema-driven Milvus ingestion shared by the embedding scripts.
+
+A ``CollectionSpec`` declares the VARCHAR fields (with their source keys
+and ``max_length``), the vector field and which field is embedded. ``run``
+streams records from the source, packs them into batches by estimated
+token count, embeds them with the ``EMBED_BACKEND`` backend (cached,
+optionally pipelined) and writes them to the collection.
+
+Rows whose text exceeds a VARCHAR ``max_length`` or the per-input token
+limit are truncated or written to an overflow JSONL file
+(``VARCHAR_OVERFLOW=truncate|route``) instead of failing the insert.
+
+``VECTOR_TYPE=float16|binary`` stores compact vectors (see quantize.py);
+the vector and scalar index layout is configurable (see indexes.py).
+Specs with a ``group_by`` key also get per-group centroids in a companion
+collection (see centroids.py). Both are computed in a pass over the source
+after ingestion, from the float32 embeddings served by the local cache.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import centroids
+import indexes
+import quantize
+from checkpoint import Checkpoint, Committer, content_key, dedupe_by_key
+from embedders import Embedder, load_embedder
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from pipeline import EmbeddingPipeline, RateLimiter
+from records import Batch, iter_json_records, normalize
+
+# OpenAI accepts at most 2048 inputs per request and 8191 tokens per input
+API_MAX_INPUTS = 2048
+API_MAX_INPUT_TOKENS = 8191
+
+OVERFLOW_POLICIES = ("truncate", "route")
+
+Reader = Callable[[str, Optional[int], int], Iterator[Tuple[Optional[int], Dict[str, Any]]]]
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class TextField:
+    """A VARCHAR field; ``source`` is the record key it is read from (defaults to ``name``).
+
+    ``index`` marks fields that queries filter on; only those get a scalar index by default.
+    """
+
+    name: str
+    max_length: int
+    source: Optional[str] = None
+    index: bool = True
+
+    @property
+    def key(self) -> str:
+        return self.source or self.name
+
+
+@dataclass(frozen=True)
+class CollectionSpec:
+    """Declarative description of one collection and how records map onto it."""
+
+    name: str
+    description: str
+    fields: Tuple[TextField, ...]
+    embed_source: str
+    vector_field: str = "vector"
+    dim: int = 1536
+    metric: str = "COSINE"
+    vector_type: str = "float32"
+    vector_index: str = "AUTOINDEX"
+    vector_index_params: Optional[Dict[str, Any]] = None
+    # Source key whose values get a centroid each (None = no centroids)
+    group_by: Optional[str] = None
+
+    @property
+    def source_keys(self) -> List[str]:
+        return [f.key for f in self.fields]
+
+    def key_of(self, record: Dict[str, Any]) -> int:
+        return content_key([record.get(k, "") for k in self.source_keys])
+
+
+@dataclass
+class IngestConfig:
+    backend: str = "openai"
+    embedding_model: str = "text-embedding-3-small"
+    milvus_host: str = "localhost"
+    milvus_port: int = 19530
+    # Batches are packed up to batch_tokens estimated tokens and at most batch_size rows
+    batch_tokens: int = 100_000
+    batch_size: int = API_MAX_INPUTS
+    max_input_tokens: int = API_MAX_INPUT_TOKENS
+    overflow: str = "truncate"
+    overflow_path: Optional[str] = None
+    # Pipelined ingestion: concurrent embedding requests overlapped with inserts
+    pipeline: bool = False
+    concurrency: int = 4
+    rpm: float = 3000
+    tpm: float = 1_000_000
+    max_retries: int = 6
+    # Local embedding cache keyed by (model, text hash); path via EMBED_CACHE_PATH
+    cache: bool = True
+    # Upsert mode: content-derived primary keys, resumable checkpoint, flush every N rows (0 = only at the end)
+    upsert: bool = False
+    flush_every: int = 0
+    checkpoint_path: Optional[str] = None
+    # Explicit start position (overrides the checkpoint): a byte offset from a checkpoint, or a record count
+    start_byte: Optional[int] = None
+    start_record: int = 0
+    # Post-ingestion pass: centroids for specs with group_by, and a recall sample for compact vector types
+    centroids: bool = True
+    centroids_only: bool = False
+    recall_sample: int = 2000
+
+    @classmethod
+    def from_env(cls) -> "IngestConfig":
+        start_byte = os.getenv("EMBED_START_BYTE")
+        return cls(
+            backend=os.getenv("EMBED_BACKEND", "openai").lower(),
+            embedding_model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+            milvus_host=os.getenv("MILVUS_HOST", "localhost"),
+            milvus_port=int(os.getenv("MILVUS_PORT", "19530")),
+            batch_tokens=int(os.getenv("EMBED_BATCH_TOKENS", "100000")),
+            batch_size=min(API_MAX_INPUTS, int(os.getenv("EMBED_BATCH_SIZE", str(API_MAX_INPUTS)))),
+            max_input_tokens=int(os.getenv("EMBED_MAX_INPUT_TOKENS", str(API_MAX_INPUT_TOKENS))),
+            overflow=os.getenv("VARCHAR_OVERFLOW", "truncate"),
+            overflow_path=os.getenv("VARCHAR_OVERFLOW_PATH"),
+            pipeline=_env_flag("EMBED_PIPELINE", "0"),
+            concurrency=int(os.getenv("EMBED_CONCURRENCY", "4")),
+            rpm=float(os.getenv("EMBED_RPM", "3000")),
+            tpm=float(os.getenv("EMBED_TPM", "1000000")),
+            max_retries=int(os.getenv("EMBED_MAX_RETRIES", "6")),
+            cache=_env_flag("EMBED_CACHE", "1"),
+            upsert=_env_flag("EMBED_UPSERT", "0"),
+            flush_every=int(os.getenv("FLUSH_EVERY_ROWS", "0")),
+            checkpoint_path=os.getenv("EMBED_CHECKPOINT"),
+            start_byte=int(start_byte) if start_byte else None,
+            start_record=int(os.getenv("EMBED_START_RECORD", "0")),
+            centroids=_env_flag("EMBED_CENTROIDS", "1"),
+            centroids_only=_env_flag("CENTROIDS_ONLY", "0"),
+            recall_sample=int(os.getenv("RECALL_SAMPLE", "2000")),
+        )
+
+    def load_embedder(self) -> Embedder:
+        # OPENAI_EMBEDDING_MODEL names an OpenAI model; the other backends read their own settings
+        return load_embedder(self.backend, self.embedding_model if self.backend == "openai" else None)
+
+
+def spec_from_env(spec: CollectionSpec, dim: Optional[int] = None) -> CollectionSpec:
+    """Apply the MILVUS_COLLECTION / VECTOR_* / SCALAR_INDEXES overrides to a spec.
+
+    ``dim`` is the embedding backend's dimension; VECTOR_DIM must agree with it.
+    """
+    env_dim = os.getenv("VECTOR_DIM")
+    if dim is not None and env_dim and int(env_dim) != dim:
+        raise RuntimeError(f"VECTOR_DIM={env_dim} does not match the embedding backend's dimension {dim}")
+    vector_type = os.getenv("VECTOR_TYPE", spec.vector_type).lower()
+    if vector_type not in quantize.VECTOR_TYPES:
+        raise ValueError(f"VECTOR_TYPE must be one of {quantize.VECTOR_TYPES}, got '{vector_type}'")
+    metric = os.getenv("VECTOR_METRIC", spec.metric)
+    if vector_type == "binary" and metric not in quantize.BINARY_METRICS:
+        # Binary vectors only support bit distances
+        metric = "HAMMING"
+    dim = dim or int(env_dim or spec.dim)
+    vector_index, overrides = indexes.vector_index_from_env(spec.vector_index, vector_type)
+    # Fail on bad index parameters before anything is embedded
+    indexes.split_params(vector_index, dim, {**(spec.vector_index_params or {}), **overrides})
+    indexed = indexes.scalar_indexes_from_env([f.name for f in spec.fields], [f.name for f in spec.fields if f.index])
+    return replace(
+        spec,
+        name=os.getenv("MILVUS_COLLECTION", spec.name),
+        dim=dim,
+        metric=metric,
+        vector_type=vector_type,
+        vector_index=vector_index,
+        vector_index_params={**(spec.vector_index_params or {}), **overrides},
+        fields=tuple(replace(f, index=f.name in indexed) for f in spec.fields),
+    )
+
+
+def ensure_collection(spec: CollectionSpec, auto_id: bool = True):
+    """Create collection and indexes if absent; otherwise check and return the existing collection."""
+    from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+
+    if not utility.has_collection(spec.name):
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=auto_id),
+            FieldSchema(name=spec.vector_field, dtype=quantize.milvus_dtype(spec.vector_type), dim=spec.dim),
+        ]
+        fields += [FieldSchema(name=f.name, dtype=DataType.VARCHAR, max_length=f.max_length) for f in spec.fields]
+        collection = Collection(name=spec.name, schema=CollectionSchema(fields=fields, description=spec.description))
+    else:
+        collection = Collection(spec.name)
+        vector = next((f for f in collection.schema.fields if f.name == spec.vector_field), None)
+        if vector is not None and vector.params.get("dim") is not None and int(vector.params["dim"]) != spec.dim:
+            raise RuntimeError(
+                f"Collection '{spec.name}' stores {vector.params['dim']}-d vectors but the embedding backend produces "
+                f"{spec.dim}-d ones. Use another MILVUS_COLLECTION."
+            )
+        if vector is not None and vector.dtype != quantize.milvus_dtype(spec.vector_type):
+            raise RuntimeError(
+                f"Collection '{spec.name}' stores {vector.dtype.name} vectors, not VECTOR_TYPE={spec.vector_type}. "
+                "Use another MILVUS_COLLECTION."
+            )
+        if collection.schema.auto_id != auto_id:
+            raise RuntimeError(
+                f"Collection '{spec.name}' was created with auto_id={collection.schema.auto_id}; "
+                f"{'insert' if auto_id else 'upsert'} mode needs auto_id={auto_id}. Use another MILVUS_COLLECTION."
+            )
+
+    try:
+        existing = collection.indexes
+    except Exception:
+        existing = []
+    names = {getattr(ix, "field_name", None) for ix in existing}
+
+    if spec.vector_field not in names:
+        collection.create_index(
+            field_name=spec.vector_field,
+            index_params=indexes.vector_index_params(spec.vector_index, spec.metric, spec.dim, spec.vector_index_params),
+        )
+    for text_field in spec.fields:
+        if text_field.index and text_field.name not in names:
+            collection.create_index(
+                field_name=text_field.name,
+                index_params={"index_type": "AUTOINDEX", "params": {}},
+            )
+
+    # Load for search/insert performance
+    collection.load()
+    return collection
+
+
+class TokenCounter:
+    """Local token estimate: tiktoken when installed, otherwise ~4 characters per token."""
+
+    def __init__(self, model: str) -> None:
+        try:
+            import tiktoken  # type: ignore
+
+            self.encoding = tiktoken.encoding_for_model(model)
+        except Exception:
+            self.encoding = None
+
+    def __call__(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is not None:
+            return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        return text[:max(0, max_tokens - 1) * 4]
+
+
+def truncate_utf8(text: str, max_bytes: int) -> str:
+    """Cut ``text`` to at most ``max_bytes`` UTF-8 bytes (Milvus VARCHAR lengths are in bytes)."""
+    return text.encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+
+
+@dataclass
+class OverflowGuard:
+    """Keeps oversized rows from failing a whole insert: truncates them or routes them to a JSONL file."""
+
+    spec: CollectionSpec
+    count_tokens: TokenCounter
+    max_input_tokens: int
+    policy: str = "truncate"
+    path: Optional[str] = None
+    truncated: int = 0
+    routed: int = 0
+    _file: Any = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"VARCHAR_OVERFLOW must be one of {OVERFLOW_POLICIES}, got '{self.policy}'")
+        self.path = self.path or f"{self.spec.name}.overflow.jsonl"
+
+    def check(self, record: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], int]:
+        """``(record, tokens)`` ready to embed and insert, or ``(None, 0)`` when it was routed aside."""
+        too_long = [
+            f for f in self.spec.fields if len(str(record.get(f.key, "")).encode("utf-8")) > f.max_length
+        ]
+        tokens = self.count_tokens(str(record.get(self.spec.embed_source, "")))
+        if not too_long and tokens <= self.max_input_tokens:
+            return record, tokens
+        if self.policy == "route":
+            reasons = [f"{f.name} > {f.max_length} bytes" for f in too_long]
+            if tokens > self.max_input_tokens:
+                reasons.append(f"{self.spec.embed_source} ~{tokens} tokens > {self.max_input_tokens}")
+            self._route(record, reasons)
+            return None, 0
+        # Keys were derived from the untruncated values by callers that need them, so truncation keeps them stable
+        record = dict(record)
+        for f in too_long:
+            record[f.key] = truncate_utf8(str(record.get(f.key, "")), f.max_length)
+        tokens = self.count_tokens(str(record.get(self.spec.embed_source, "")))
+        if tokens > self.max_input_tokens:
+            record[self.spec.embed_source] = self.count_tokens.truncate(
+                str(record.get(self.spec.embed_source, "")), self.max_input_tokens
+            )
+            tokens = self.count_tokens(record[self.spec.embed_source])
+        self.truncated += 1
+        return record, tokens
+
+    def _route(self, record: Dict[str, Any], reasons: List[str]) -> None:
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps({"reasons": reasons, "record": record}, ensure_ascii=False) + "\n")
+            self.routed += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> str:
+        line = f"Overflow ({self.policy}): {self.truncated} rows truncated, {self.routed} routed"
+        return line + (f" to {self.path}" if self.routed else "")
+
+
+def pack_batches(
+    records: Iterable[Tuple[Optional[int], Dict[str, Any]]],
+    guard: OverflowGuard,
+    max_tokens: int,
+    max_rows: int,
+) -> Iterator[Batch]:
+    """Group records into batches of at most ``max_tokens`` estimated tokens and ``max_rows`` rows."""
+    batch, batch_tokens = Batch(), 0
+    for end, record in records:
+        row, tokens = guard.check(record)
+        if row is not None and batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_rows):
+            yield batch
+            batch, batch_tokens = Batch(), 0
+        if row is not None:
+            batch.append(row)
+            batch_tokens += tokens
+        batch.consumed += 1
+        batch.end_byte = end
+    if batch.consumed:
+        yield batch
+
+
+def to_entities(spec: CollectionSpec, seg: List[Dict[str, Any]], vectors: List[List[float]]) -> List[List[Any]]:
+    # Aligned columns in schema order (excluding the primary key)
+    return [quantize.encode(vectors, spec.vector_type)] + [[str(r.get(f.key, "")) for r in seg] for f in spec.fields]
+
+
+def write_rows(collection, spec: CollectionSpec, seg: List[Dict[str, Any]], vectors: List[List[float]], upsert: bool) -> None:
+    if not seg:
+        return
+    entities = to_entities(spec, seg, vectors)
+    if not upsert:
+        collection.insert(entities)
+        return
+    # Same content -> same key, so reruns and duplicate rows overwrite instead of piling up
+    keys = [r["_key"] for r in seg]
+    collection.upsert(dedupe_by_key(keys, entities))
+
+
+def ingest_serial(collection, spec: CollectionSpec, batches: Iterable[Batch], embedder, upsert: bool, committer: Committer) -> None:
+    ingest_start = time.time()
+    inserted = 0
+    for seg in batches:
+        vectors = embedder([str(r.get(spec.embed_source, "")) for r in seg]) if seg else []
+        write_rows(collection, spec, seg, vectors, upsert)
+        committer.committed(seg.consumed, seg.end_byte)
+        inserted += len(seg)
+        print(f"Inserted {len(seg)} rows (total {committer.offset})")
+    committer.finish()
+    ingest_s = time.time() - ingest_start
+    print(f"Serial: {inserted} rows in {ingest_s:.1f}s ({inserted / ingest_s if ingest_s else 0.0:.1f} rows/sec)")
+
+
+def ingest_pipelined(
+    backend: Embedder,
+    collection,
+    spec: CollectionSpec,
+    config: IngestConfig,
+    batches: Iterable[Batch],
+    cache: Optional[EmbeddingCache],
+    committer: Committer,
+) -> None:
+    def insert(seg, vectors):
+        write_rows(collection, spec, seg, vectors, config.upsert)
+        committer.committed(seg.consumed, seg.end_byte)
+
+    pipeline = EmbeddingPipeline(
+        embed=backend,
+        insert=insert,
+        concurrency=config.concurrency,
+        # Only a remote API has quotas; local backends run unthrottled
+        limiter=RateLimiter(rpm=config.rpm, tpm=config.tpm) if config.backend == "openai" else RateLimiter(),
+        max_retries=config.max_retries,
+    )
+    # Cache lookups and de-duplication happen before the rate limiter, so cached texts cost no API quota
+    embedder = CachedEmbedder(pipeline.embed_with_retry, backend.model_id, cache)
+    stats = pipeline.run(
+        batches,
+        texts_of=lambda seg: [str(r.get(spec.embed_source, "")) for r in seg],
+        on_insert=lambda st: print(f"Inserted {committer.offset} rows ({st.rows_per_sec:.1f} rows/sec)"),
+        embed=embedder,
+    )
+    committer.finish()
+    stats.finished = time.monotonic()
+    print(f"Pipelined: {stats.summary()}")
+    print(embedder.summary())
+
+
+def json_reader(spec: CollectionSpec) -> Reader:
+    """Default reader: one record per JSON array element / JSONL line, normalized to the spec's keys."""
+
+    def read(path: str, start_byte: Optional[int], skip_records: int):
+        for end, record in iter_json_records(path, start_byte=start_byte, skip_records=skip_records):
+            yield end, normalize(record, spec.source_keys)
+
+    return read
+
+
+def with_keys(spec: CollectionSpec, records: Iterable[Tuple[Optional[int], Dict[str, Any]]]):
+    """Attach each record's upsert key, computed from the original values before any truncation."""
+    for end, record in records:
+        yield end, {**record, "_key": spec.key_of(record)}
+
+
+def ingest_source(
+    spec: CollectionSpec,
+    config: IngestConfig,
+    source_path: str,
+    reader: Reader,
+    backend: Embedder,
+    cache: Optional[EmbeddingCache],
+    checkpoint_path: str,
+) -> None:
+    collection = ensure_collection(spec, auto_id=not config.upsert)
+
+    start_byte, offset = config.start_byte, config.start_record
+    skip_records = offset
+    if config.upsert:
+        checkpoint = Checkpoint(checkpoint_path, spec.name, source_path)
+        if start_byte is None and not offset and checkpoint.load():
+            offset = checkpoint.offset
+            start_byte = checkpoint.byte_offset
+            # Without a byte position the already-committed records are parsed and skipped.
+            skip_records = 0 if start_byte is not None else offset
+            print(f"Resuming after row {offset} from {checkpoint_path}")
+        committer = Committer(collection, checkpoint, config.flush_every, offset, start_byte)
+    else:
+        # Original behaviour: auto ids, flush after every batch (at the end when pipelined)
+        committer = Committer(collection, flush_every=0 if config.pipeline else 1, offset=offset, byte_offset=start_byte)
+
+    # Records are read lazily, so memory stays bounded whatever the file size
+    records = reader(source_path, start_byte, skip_records)
+    first = next(records, None)
+    if first is None:
+        print("No records found. Nothing to do.")
+        return
+    records = chain([first], records)
+    if config.upsert:
+        records = with_keys(spec, records)
+
+    count_tokens = TokenCounter(config.embedding_model)
+    guard = OverflowGuard(spec, count_tokens, config.max_input_tokens, config.overflow, config.overflow_path)
+    batches = pack_batches(records, guard, config.batch_tokens, config.batch_size)
+
+    try:
+        if config.pipeline:
+            ingest_pipelined(backend, collection, spec, config, batches, cache, committer)
+        else:
+            embedder = CachedEmbedder(backend, backend.model_id, cache)
+            ingest_serial(collection, spec, batches, embedder, config.upsert, committer)
+            print(embedder.summary())
+    finally:
+        guard.close()
+    print(guard.summary())
+
+    # Keep collection loaded for immediate querying
+    collection.load()
+
+
+def summarize_source(
+    spec: CollectionSpec,
+    config: IngestConfig,
+    records: Iterable[Tuple[Optional[int], Dict[str, Any]]],
+    embedder,
+) -> None:
+    """Post-ingestion pass: per-group centroids and, for compact vector types, a recall check.
+
+    Rows go through the same overflow policy as the ingestion (routed rows are
+    left out, truncated ones embedded as stored) and, in upsert mode, repeated
+    keys count once, so the centroids average exactly what the collection holds.
+    """
+    accumulator = centroids.CentroidAccumulator(spec.dim) if spec.group_by and config.centroids else None
+    sample: List[List[float]] = []
+    wanted = config.recall_sample if spec.vector_type != "float32" else 0
+    if accumulator is None and not wanted:
+        return
+
+    # Routed rows were already written to the overflow file during ingestion
+    guard = OverflowGuard(spec, TokenCounter(config.embedding_model), config.max_input_tokens, config.overflow, os.devnull)
+    seen = set()
+    for seg in pack_batches(records, guard, config.batch_tokens, config.batch_size):
+        if config.upsert:
+            seg = [r for r in seg if r["_key"] not in seen and not seen.add(r["_key"])]
+        vectors = embedder([str(r.get(spec.embed_source, "")) for r in seg]) if seg else []
+        if accumulator is not None:
+            accumulator.add([str(r.get(spec.group_by, "")) for r in seg], vectors)
+        sample.extend(vectors[:max(0, wanted - len(sample))])
+        if accumulator is None and len(sample) >= wanted:
+            break
+    guard.close()
+
+    if accumulator is not None:
+        rows = accumulator.rows()
+        name = spec.name + centroids.CENTROID_SUFFIX
+        centroids.write_centroids(name, spec.group_by, spec.dim, "COSINE" if spec.vector_type == "binary" else spec.metric, rows)
+        print(centroids.summary(rows))
+        print(f"Wrote {len(rows)} centroids to '{name}'")
+    if len(sample) >= 2:
+        report = quantize.recall_report(sample)
+        print(f"Recall against float32 over {len(sample)} vectors:")
+        for vector_type, row in report.items():
+            print(f"  {vector_type:>8}: recall@10 {row['recall@10']:.3f}, {row['memory_ratio']:.1%} of float32 memory")
+
+
+def run(spec: CollectionSpec, source_path: str, reader: Optional[Reader] = None, config: Optional[IngestConfig] = None) -> None:
+    from pymilvus import connections
+
+    config = config or IngestConfig.from_env()
+    backend = config.load_embedder()
+    spec = spec_from_env(spec, backend.dim)
+    reader = reader or json_reader(spec)
+    checkpoint_path = config.checkpoint_path or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), f".{spec.name}.checkpoint.json"
+    )
+
+    start_ts = time.time()
+    print(f"Start: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    connections.connect(alias="default", host=config.milvus_host, port=config.milvus_port)
+    # Vectors already embedded by an earlier run are read from the local cache
+    cache = EmbeddingCache() if config.cache else None
+
+    try:
+        if not config.centroids_only:
+            ingest_source(spec, config, source_path, reader, backend, cache, checkpoint_path)
+        if cache is None and (spec.group_by or spec.vector_type != "float32"):
+            print("EMBED_CACHE is off: the centroid / recall pass embeds the source again")
+        # The whole source is read again (from the start) so resumed runs still get complete centroids
+        records = reader(source_path, None, 0)
+        if config.upsert:
+            records = with_keys(spec, records)
+        summarize_source(spec, config, records, CachedEmbedder(backend, backend.model_id, cache))
+    finally:
+        if cache is not None:
+            cache.close()
+
+    end_ts = time.time()
+    elapsed = timedelta(seconds=int(end_ts - start_ts))
+    print(f"End:   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Elapsed: {elapsed}")
@@ -0,0 +1,106 @@
+"""Before/after ingestion measurement on the alpaca dataset.
+
+The same rows are ingested into two scratch collections:
+
+  before: auto_id inserts with a flush after every batch (the original loop)
+  after:  content-key upserts with one flush at the end (or every --flush-every rows)
+
+Wall time, resulting segment count and row count are reported. The "after"
+collection is then ingested a second time to show that a rerun adds no
+duplicates. Embeddings come from the local cache, warmed before timing, so
+both runs pay the same embedding cost.
+
+    python measure_ingest.py --limit 20000 --output ingest_measurement.json
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from pymilvus import connections, utility
+
+import ingest
+from checkpoint import Committer, segment_count
+from embed_instruction_alpaca import JSON_PATH, SPEC
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from records import batched_records, read_all
+
+
+def row_count(collection) -> int:
+    return int(collection.query(expr="", output_fields=["count(*)"])[0]["count(*)"])
+
+
+def run_case(name: str, rows: List[Dict[str, Any]], embedder, batch: int, upsert: bool, flush_every: int, reruns: int) -> Dict[str, Any]:
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    spec = ingest.CollectionSpec(name, SPEC.description, SPEC.fields, SPEC.embed_source, dim=embedder.embed.dim)
+    collection = ingest.ensure_collection(spec, auto_id=not upsert)
+    timings = []
+    for _ in range(1 + reruns):
+        committer = Committer(collection, flush_every=flush_every)
+        start = time.perf_counter()
+        ingest.ingest_serial(collection, spec, batched_records(((None, r) for r in rows), batch), embedder, upsert, committer)
+        timings.append(time.perf_counter() - start)
+    collection.load()
+    return {
+        "collection": name,
+        "upsert": upsert,
+        "flush_every": flush_every,
+        "wall_s": timings[0],
+        "rerun_wall_s": timings[1:],
+        "rows_per_sec": len(rows) / timings[0] if timings[0] else 0.0,
+        "segments": segment_count(name),
+        "rows_in_collection": row_count(collection),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default=JSON_PATH)
+    parser.add_argument("--limit", type=int, default=0, help="only ingest the first N rows (0 = all)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("EMBED_BATCH_SIZE", "512")))
+    parser.add_argument("--flush-every", type=int, default=0, help="rows between flushes in the 'after' run (0 = end only)")
+    parser.add_argument("--collection-prefix", default=f"{SPEC.name}_measure")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collections")
+    parser.add_argument("--output", default=None, help="optionally write the results as JSON")
+    args = parser.parse_args()
+
+    config = ingest.IngestConfig.from_env()
+    connections.connect(host=config.milvus_host, port=config.milvus_port)
+    rows = read_all(args.path, SPEC.source_keys)
+    if args.limit:
+        rows = rows[:args.limit]
+    for row in rows:
+        row["_key"] = SPEC.key_of(row)
+
+    backend = config.load_embedder()
+    cache = EmbeddingCache()
+    embedder = CachedEmbedder(backend, backend.model_id, cache)
+    for seg in batched_records(((None, r) for r in rows), args.batch_size):
+        embedder([r.get(SPEC.embed_source, "") for r in seg])
+    print(embedder.summary())
+
+    results = [
+        run_case(f"{args.collection_prefix}_before", rows, embedder, args.batch_size, False, 1, reruns=0),
+        run_case(f"{args.collection_prefix}_after", rows, embedder, args.batch_size, True, args.flush_every, reruns=1),
+    ]
+
+    print(f"{len(rows)} rows, batch size {args.batch_size}")
+    print(f"{'case':>7} {'wall s':>8} {'rows/sec':>9} {'segments':>9} {'rows':>8} {'rerun s':>8}")
+    for label, result in zip(("before", "after"), results):
+        rerun = f"{result['rerun_wall_s'][0]:.1f}" if result["rerun_wall_s"] else "-"
+        print(f"{label:>7} {result['wall_s']:>8.1f} {result['rows_per_sec']:>9.1f} {result['segments']:>9} "
+              f"{result['rows_in_collection']:>8} {rerun:>8}")
+
+    if not args.keep:
+        for result in results:
+            utility.drop_collection(result["collection"])
+    cache.close()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": len(rows), "batch_size": args.batch_size, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
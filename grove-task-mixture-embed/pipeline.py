@@ -0,0 +1,218 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError")
+
+
+def estimate_tokens(texts: Sequence[str]) -> int:
+    """Rough token count for rate limiting (~4 characters per token for English)."""
+    return sum(len(t) // 4 + 1 for t in texts)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute`` units per minute."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, amount: float = 1.0, take: bool = True) -> float:
+        """Take ``amount`` units if available and return 0, else the seconds until they would be.
+
+        With ``take=False`` only checks, leaving the units in the bucket.
+        """
+        # A single request larger than the bucket could otherwise never be served.
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.available >= amount:
+                if take:
+                    self.available -= amount
+                return 0.0
+            return (amount - self.available) / self.rate
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until ``amount`` units are available; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(amount)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits in front of an embedding API."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0) -> None:
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+
+    def acquire(self, tokens: int) -> float:
+        waited = 0.0
+        if self.requests is not None:
+            waited += self.requests.acquire(1)
+        if self.tokens is not None:
+            waited += self.tokens.acquire(tokens)
+        return waited
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(exc).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class PipelineStats:
+    rows: int = 0
+    batches: int = 0
+    retries: int = 0
+    throttled_s: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows} rows in {self.elapsed_s:.1f}s ({self.rows_per_sec:.1f} rows/sec), "
+            f"{self.batches} batches, {self.retries} retries, {self.throttled_s:.1f}s throttled"
+        )
+
+
+class EmbeddingPipeline:
+    """Embeds batches concurrently while a separate thread inserts finished ones.
+
+    Each batch travels together with its own vectors, so row-to-vector
+    alignment never depends on completion order. Batches are inserted in
+    the order they were read; at most ``concurrency`` embedding calls run at
+    once and at most ``max_pending`` embedded batches wait for the insert
+    stage, which bounds memory.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[List[float]]],
+        insert: Callable[[Sequence[Any], List[List[float]]], None],
+        concurrency: int = 4,
+        max_pending: Optional[int] = None,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = 6,
+        backoff_s: float = 1.0,
+        max_backoff_s: float = 60.0,
+    ) -> None:
+        self.embed = embed
+        self.insert = insert
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending or self.concurrency * 2
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.stats = PipelineStats()
+
+    def embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        tokens = estimate_tokens(texts)
+        for attempt in range(self.max_retries + 1):
+            waited = self.limiter.acquire(tokens)
+            try:
+                vectors = self.embed(texts)
+            except Exception as exc:
+                if attempt == self.max_retries or not is_retryable(exc):
+                    raise
+                delay = retry_after(exc) or min(self.max_backoff_s, self.backoff_s * 2 ** attempt)
+                delay *= random.uniform(1.0, 1.25)
+                with self.stats.lock:
+                    self.stats.retries += 1
+                    self.stats.throttled_s += waited
+                print(f"Embedding request failed ({exc}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"Embedding API returned {len(vectors)} vectors for {len(texts)} inputs")
+            with self.stats.lock:
+                self.stats.throttled_s += waited
+            return vectors
+        raise AssertionError("unreachable")
+
+    def run(
+        self,
+        batches: Iterable[Sequence[Any]],
+        texts_of: Callable[[Sequence[Any]], List[str]],
+        on_insert: Optional[Callable[[PipelineStats], None]] = None,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+    ) -> PipelineStats:
+        """Run every batch through embed and insert; ``embed`` defaults to ``embed_with_retry``."""
+        embed = embed or self.embed_with_retry
+        pending: "queue.Queue[Optional[Tuple[Sequence[Any], Future]]]" = queue.Queue(self.max_pending)
+        errors: List[BaseException] = []
+
+        def insert_stage() -> None:
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                rows, future = item
+                if errors:
+                    future.cancel()
+                    continue
+                try:
+                    self.insert(rows, future.result())
+                except BaseException as exc:
+                    errors.append(exc)
+                    continue
+                self.stats.rows += len(rows)
+                self.stats.batches += 1
+                if on_insert is not None:
+                    on_insert(self.stats)
+
+        inserter = threading.Thread(target=insert_stage, name="embed-insert", daemon=True)
+        inserter.start()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="embed") as executor:
+            try:
+                for rows in batches:
+                    if errors:
+                        break
+                    pending.put((rows, executor.submit(embed, texts_of(rows))))
+            finally:
+                pending.put(None)
+                inserter.join()
+        self.stats.finished = time.monotonic()
+        if errors:
+            raise errors[0]
+        return self.stats
+
+
+def batched(rows: Sequence[Any], size: int) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
@@ -0,0 +1,138 @@
+"""Compact vector storage: float16 or sign-binarized vectors, with a recall check against float32.
+
+``VECTOR_TYPE=float16`` halves a collection's vector memory with a
+negligible change in neighbours. ``VECTOR_TYPE=binary`` keeps one sign
+bit per dimension (32x smaller) and searches with HAMMING distance, so
+its recall should be checked before a collection is switched over:
+
+    python quantize.py recall --model text-embedding-3-small --limit 20000 --k 10
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+VECTOR_TYPES = ("float32", "float16", "binary")
+BINARY_METRICS = ("HAMMING", "JACCARD")
+
+
+def milvus_dtype(vector_type: str):
+    from pymilvus import DataType
+
+    return {
+        "float32": DataType.FLOAT_VECTOR,
+        "float16": DataType.FLOAT16_VECTOR,
+        "binary": DataType.BINARY_VECTOR,
+    }[vector_type]
+
+
+def bytes_per_vector(dim: int, vector_type: str) -> int:
+    return {"float32": 4 * dim, "float16": 2 * dim, "binary": (dim + 7) // 8}[vector_type]
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """One bit per dimension, set where the component is positive, packed 8 per byte."""
+    return np.packbits(vectors > 0, axis=-1)
+
+
+def encode(vectors: Sequence[Sequence[float]], vector_type: str) -> List[Any]:
+    """Vectors in the form pymilvus inserts for ``vector_type``."""
+    if vector_type == "float32":
+        return list(vectors)
+    array = np.asarray(vectors, dtype=np.float32)
+    if vector_type == "float16":
+        return list(array.astype(np.float16))
+    return [row.tobytes() for row in binarize(array)]
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def recall_at_k(vectors: np.ndarray, vector_type: str, k: int = 10, queries: int = 200, seed: int = 0) -> float:
+    """Mean overlap between the float32 cosine top-k and the top-k under ``vector_type``.
+
+    Queries are sampled from ``vectors`` themselves and never count as their own neighbour.
+    """
+    base = _normalized(np.asarray(vectors, dtype=np.float32))
+    n = len(base)
+    k = min(k, n - 1)
+    if k < 1:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(n, size=min(queries, n), replace=False)
+
+    exact_scores = base[picked] @ base.T
+    if vector_type == "float32":
+        approx_scores = exact_scores.copy()
+    elif vector_type == "float16":
+        half = base.astype(np.float16).astype(np.float32)
+        approx_scores = half[picked] @ half.T
+    elif vector_type == "binary":
+        # Matching bits = dim - HAMMING distance, so a higher score is a nearer neighbour
+        bits = (base > 0).astype(np.float32)
+        approx_scores = bits[picked] @ bits.T + (1 - bits[picked]) @ (1 - bits).T
+    else:
+        raise ValueError(f"VECTOR_TYPE must be one of {VECTOR_TYPES}, got '{vector_type}'")
+
+    rows = np.arange(len(picked))
+    exact_scores[rows, picked] = -np.inf
+    approx_scores[rows, picked] = -np.inf
+    exact = _top_k(exact_scores, k)
+    approx = _top_k(approx_scores, k)
+    hits = [len(set(a) & set(e)) for a, e in zip(approx.tolist(), exact.tolist())]
+    return float(np.mean(hits)) / k
+
+
+def recall_report(vectors: Sequence[Sequence[float]], k: int = 10, queries: int = 200) -> Dict[str, Dict[str, float]]:
+    array = np.asarray(vectors, dtype=np.float32)
+    dim = array.shape[1]
+    return {
+        vector_type: {
+            f"recall@{k}": round(recall_at_k(array, vector_type, k, queries), 4),
+            "bytes_per_vector": bytes_per_vector(dim, vector_type),
+            "memory_ratio": round(bytes_per_vector(dim, vector_type) / bytes_per_vector(dim, "float32"), 4),
+        }
+        for vector_type in VECTOR_TYPES
+    }
+
+
+def main() -> None:
+    from embedding_cache import DEFAULT_PATH, EmbeddingCache
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    recall = sub.add_parser("recall", help="recall@k of float16 / binary against float32, from cached embeddings")
+    recall.add_argument("--model", default="text-embedding-3-small", help="embedding cache model id (e.g. hash:1536)")
+    recall.add_argument("--cache-path", default=DEFAULT_PATH)
+    recall.add_argument("--limit", type=int, default=20000, help="vectors to search over (0 = all cached)")
+    recall.add_argument("--queries", type=int, default=200)
+    recall.add_argument("--k", type=int, default=10)
+    recall.add_argument("--output", default=None, help="optionally write the report as JSON")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.cache_path)
+    vectors = cache.vectors(args.model, args.limit)
+    cache.close()
+    if len(vectors) < 2:
+        raise SystemExit(f"Need at least 2 cached vectors for model '{args.model}', found {len(vectors)}")
+
+    report = recall_report(vectors, args.k, args.queries)
+    print(f"{len(vectors)} vectors, {args.queries} queries")
+    for vector_type, row in report.items():
+        print(f"  {vector_type:>8}: recall@{args.k} {row[f'recall@{args.k}']:.3f}, "
+              f"{row['bytes_per_vector']} bytes/vector ({row['memory_ratio']:.1%} of float32)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "queries": args.queries, "k": args.k, "report": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Incremental JSON / JSONL record reader.
+
+Reads a top-level array, a JSONL file, or an object holding the records
+under one of ``CONTAINER_KEYS`` chunk by chunk, so memory stays bounded
+by the largest single record rather than the file size. Every record is yielded with the byte offset
+just past it; passing that offset back as ``start_byte`` resumes reading
+with the next record.
+
+``iter_stream_records`` reads the same formats from any binary stream
+without seeking (decompressors, uploads); offsets then count from where
+the stream started.
+"""
+import codecs
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+CONTAINER_KEYS = ("data", "items", "records", "rows", "examples")
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+CHUNK_SIZE = 1 << 20
+# Longest first line probed when sniffing JSONL; a longer one is parsed as a single JSON document.
+SNIFF_LIMIT = 16 << 20
+WHITESPACE = " \t\r\n"
+BOM = "\ufeff"
+
+_decoder = json.JSONDecoder()
+# Character set -> pattern matching the first character outside it
+_not_in: Dict[str, "re.Pattern[str]"] = {}
+
+
+class _Buffer:
+    """Sliding text window over a binary file that tracks the byte offset of what it has consumed."""
+
+    def __init__(self, f, start_byte: int, chunk_size: int) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        # Byte offset of text[mark]; advanced lazily so each character is encoded at most once.
+        self.mark = 0
+        self.mark_byte = start_byte
+        self.eof = False
+
+    def fill(self, min_chars: int = 1) -> bool:
+        """Read until ``min_chars`` characters are available past ``pos``; False at end of file."""
+        while len(self.text) - self.pos < min_chars and not self.eof:
+            chunk = self.f.read(self.chunk_size)
+            self.eof = not chunk
+            self.text += self.decoder.decode(chunk, final=self.eof)
+        return len(self.text) - self.pos >= min_chars
+
+    def skip(self, chars: str = WHITESPACE) -> Optional[str]:
+        """Skip ``chars`` and return the next character without consuming it (None at end of file)."""
+        pattern = _not_in.get(chars)
+        if pattern is None:
+            pattern = _not_in[chars] = re.compile(f"[^{re.escape(chars)}]")
+        while True:
+            found = pattern.search(self.text, self.pos)
+            if found:
+                self.pos = found.start()
+                return self.text[self.pos]
+            self.pos = len(self.text)
+            if not self.fill():
+                return None
+
+    def expect(self, char: str) -> None:
+        found = self.skip()
+        if found != char:
+            raise ValueError(f"Expected '{char}' at byte {self.byte_offset()}, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more of the file until it is complete."""
+        self.skip()
+        want = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A value that ends exactly at the buffer edge may be a truncated number.
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    self.compact()
+                    return value
+            self.fill(len(self.text) - self.pos + want)
+            want *= 2
+
+    def byte_offset(self) -> int:
+        self.mark_byte += len(self.text[self.mark:self.pos].encode("utf-8"))
+        self.mark = self.pos
+        return self.mark_byte
+
+    def compact(self) -> None:
+        if self.pos > self.chunk_size:
+            self.byte_offset()
+            self.text = self.text[self.pos:]
+            self.pos = self.mark = 0
+
+
+def is_jsonl(path: str, f) -> bool:
+    """Whether ``path`` (open as ``f`` at byte 0) is JSONL; ``f`` is left at byte 0."""
+    if path.lower().endswith(JSONL_EXTENSIONS):
+        return True
+    # A first line that is a complete object followed by another value is JSONL as well.
+    if f.read(4096).lstrip()[:1] != b"{":
+        f.seek(0)
+        return False
+    f.seek(0)
+    first = f.readline(SNIFF_LIMIT)
+    rest = f.read(64).lstrip()
+    f.seek(0)
+    try:
+        return isinstance(json.loads(first), dict) and rest[:1] == b"{"
+    except ValueError:
+        return False
+
+
+def _iter_jsonl(f, offset: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Records of the lines read from ``f``, whose current position is byte ``offset`` of the file."""
+    for line in f:
+        offset += len(line)
+        if line.strip():
+            record = json.loads(line)
+            if isinstance(record, dict):
+                yield offset, record
+
+
+def _iter_array(buf: _Buffer, resume: bool) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Elements of the array whose '[' was just consumed, or of which ``buf`` is mid-way if ``resume``."""
+    first = not resume
+    while True:
+        char = buf.skip()
+        if char == "]":
+            buf.pos += 1
+            return
+        if char is None:
+            raise ValueError("Unexpected end of file inside a JSON array")
+        if not first:
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at byte {buf.byte_offset()}, found {char!r}")
+            buf.pos += 1
+            buf.skip()
+        first = False
+        value = buf.value()
+        if isinstance(value, dict):
+            yield buf.byte_offset(), value
+
+
+def _find_container(buf: _Buffer) -> Optional[Dict[str, Any]]:
+    """Walk a top-level object up to the first container key holding an array.
+
+    Leaves ``buf`` just inside that array and returns None, or returns the
+    whole object when it has no such key (it is then a single record).
+    """
+    buf.expect("{")
+    seen: Dict[str, Any] = {}
+    while True:
+        char = buf.skip(WHITESPACE + ",")
+        if char == "}":
+            buf.pos += 1
+            return seen
+        key = buf.value()
+        buf.expect(":")
+        if key in CONTAINER_KEYS and buf.skip() == "[":
+            buf.pos += 1
+            return None
+        seen[key] = buf.value()
+
+
+def _open_array(buf: _Buffer, name: str) -> Optional[Dict[str, Any]]:
+    """Consume up to the first record of the record array, or return the whole object if it is a single record."""
+    head = buf.skip(WHITESPACE + BOM)
+    if head == "[":
+        buf.pos += 1
+        return None
+    if head == "{":
+        return _find_container(buf)
+    raise ValueError(f"{name} does not start with a JSON array or object")
+
+
+def _iter_concatenated(buf: _Buffer) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Objects following a top-level object: JSONL whose first line was too long to be sniffed as such."""
+    while True:
+        char = buf.skip()
+        if char is None:
+            return
+        if char != "{":
+            raise ValueError(f"Expected a JSON object at byte {buf.byte_offset()}, found {char!r}")
+        value = buf.value()
+        yield buf.byte_offset(), value
+
+
+def iter_stream_records(
+    f, jsonl: bool, chunk_size: int = CHUNK_SIZE, name: str = "The file"
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(end_byte, record)`` for every dict record of the binary stream ``f``, read once from start to end."""
+    if jsonl:
+        yield from _iter_jsonl(f, 0)
+        return
+    buf = _Buffer(f, 0, chunk_size)
+    single = _open_array(buf, name)
+    if single is not None:
+        yield buf.byte_offset(), single
+        yield from _iter_concatenated(buf)
+        return
+    yield from _iter_array(buf, resume=False)
+
+
+def iter_json_records(
+    path: str,
+    start_byte: Optional[int] = None,
+    skip_records: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(end_byte, record)`` for every dict record in ``path``.
+
+    ``start_byte`` must be an ``end_byte`` yielded earlier for the same file
+    (or a line start for JSONL); ``skip_records`` then skips that many more
+    records before yielding.
+    """
+    with open(path, "rb") as f:
+        jsonl = is_jsonl(path, f)
+        if not start_byte:
+            records = iter_stream_records(f, jsonl, chunk_size, path)
+        elif jsonl:
+            f.seek(start_byte)
+            records = _iter_jsonl(f, start_byte)
+        else:
+            single = _open_array(_Buffer(f, 0, chunk_size), path)
+            # Reopen the window right after an already-read record and continue the same array (or object sequence).
+            f.seek(start_byte)
+            buf = _Buffer(f, start_byte, chunk_size)
+            records = _iter_array(buf, resume=True) if single is None else _iter_concatenated(buf)
+        for end, record in records:
+            if skip_records:
+                skip_records -= 1
+                continue
+            yield end, record
+
+
+def normalize(record: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Fill missing or null ``fields`` with empty strings."""
+    for key in fields:
+        if record.get(key) is None:
+            record[key] = ""
+    return record
+
+
+class Batch(list):
+    """Rows of one batch plus how far into the source it reaches.
+
+    ``consumed`` counts source records the batch accounts for, including
+    any that were set aside instead of becoming rows; ``end_byte`` is the
+    byte offset just past the last of them.
+    """
+
+    end_byte: Optional[int] = None
+    consumed: int = 0
+
+
+def batched_records(records: Iterable[Tuple[Optional[int], Any]], size: int) -> Iterator[Batch]:
+    batch = Batch()
+    for end, record in records:
+        batch.append(record)
+        batch.end_byte = end
+        batch.consumed += 1
+        if len(batch) >= size:
+            yield batch
+            batch = Batch()
+    if batch:
+        yield batch
+
+
+def file_progress(path: str, end_byte: Optional[int]) -> str:
+    size = os.path.getsize(path)
+    return f"{end_byte / size:.1%}" if end_byte is not None and size else "?"
+
+
+def read_all(path: str, fields: Sequence[str]) -> List[Dict[str, Any]]:
+    return [normalize(record, fields) for _, record in iter_json_records(path)]
@@ -0,0 +1,253 @@
+"""OpenAI-compatible ``/v1/embeddings`` stub for offline load tests.
+
+Vectors come from the deterministic ``HashEmbedder``; latency, rate limits
+and error rate are configurable, and throttled requests get the same 429 +
+``Retry-After`` response the real API sends, so the openai client, the
+pipeline's retries and the rate limiter all run their real code paths.
+
+    python stub_server.py --port 8088 --latency-ms 150 --per-input-ms 0.5 --rpm 3000 --tpm 1000000
+    EMBED_BACKEND=openai OPENAI_BASE_URL=http://127.0.0.1:8088/v1 python embed_seed_sentences.py
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from embedders import OPENAI_DIMS, HashEmbedder
+from pipeline import TokenBucket, estimate_tokens
+
+MAX_INPUTS = 2048
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0.0
+    per_input_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rpm: float = 0
+    tpm: float = 0
+    error_rate: float = 0.0
+    default_dim: int = 1536
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    inputs: int = 0
+    tokens: int = 0
+    throttled: int = 0
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_dict(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "inputs": self.inputs,
+                "tokens": self.tokens,
+                "throttled": self.throttled,
+                "errors": self.errors,
+            }
+
+
+class StubState:
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.requests = TokenBucket(config.rpm) if config.rpm > 0 else None
+        self.tokens = TokenBucket(config.tpm) if config.tpm > 0 else None
+        self.embedders: Dict[int, HashEmbedder] = {}
+        self.stats = StubStats()
+        # Makes checking both limits and then charging both one step across handler threads
+        self.limit_lock = threading.Lock()
+
+    def embedder(self, dim: int) -> HashEmbedder:
+        if dim not in self.embedders:
+            self.embedders[dim] = HashEmbedder(dim)
+        return self.embedders[dim]
+
+    def throttle(self, tokens: int) -> Optional[Tuple[str, float]]:
+        """``(limit name, retry-after seconds)`` when the request is over a limit, else None.
+
+        Like the real API, a rejected request is not charged against either limit.
+        """
+        limits = [("requests", self.requests, 1), ("tokens", self.tokens, tokens)]
+        limits = [(name, bucket, amount) for name, bucket, amount in limits if bucket is not None]
+        with self.limit_lock:
+            for name, bucket, amount in limits:
+                wait = bucket.try_acquire(amount, take=False)
+                if wait:
+                    return name, wait
+            for _, bucket, amount in limits:
+                bucket.try_acquire(amount)
+        return None
+
+
+def _texts(value: Any) -> Optional[List[str]]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        return value
+    # Pre-tokenized input (token ids) is accepted; the ids stand in for the text
+    if isinstance(value, list) and value and all(isinstance(v, int) for v in value):
+        return [" ".join(map(str, value))]
+    if isinstance(value, list) and value and all(isinstance(v, list) for v in value):
+        return [" ".join(map(str, v)) for v in value]
+    return None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubState
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, message: str, kind: str, code: Optional[str] = None, headers=None) -> None:
+        self.send_json(status, {"error": {"message": message, "type": kind, "param": None, "code": code}}, headers)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/v1/models":
+            models = [{"id": name, "object": "model", "owned_by": "stub"} for name in OPENAI_DIMS]
+            self.send_json(200, {"object": "list", "data": models})
+        elif self.path.rstrip("/") == "/stats":
+            self.send_json(200, self.state.stats.as_dict())
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if self.path.rstrip("/") != "/v1/embeddings":
+            self.send_error_json(404, f"Unknown path {self.path}", "invalid_request_error")
+            return
+        try:
+            request = json.loads(raw or b"{}")
+        except ValueError:
+            self.send_error_json(400, "Request body is not valid JSON", "invalid_request_error")
+            return
+        if not isinstance(request, dict):
+            self.send_error_json(400, "Request body must be a JSON object", "invalid_request_error")
+            return
+        texts = _texts(request.get("input"))
+        if texts is None:
+            self.send_error_json(400, "'input' must be a non-empty string or array", "invalid_request_error")
+            return
+        if len(texts) > MAX_INPUTS:
+            self.send_error_json(400, f"'input' has {len(texts)} items; at most {MAX_INPUTS} are allowed", "invalid_request_error")
+            return
+
+        state, config = self.state, self.state.config
+        model = request.get("model") or "text-embedding-3-small"
+        dim = int(request.get("dimensions") or OPENAI_DIMS.get(model, config.default_dim))
+        tokens = estimate_tokens(texts)
+        with state.stats.lock:
+            state.stats.requests += 1
+
+        limited = state.throttle(tokens)
+        if limited is not None:
+            limit, wait = limited
+            with state.stats.lock:
+                state.stats.throttled += 1
+            self.send_error_json(
+                429,
+                f"Rate limit reached for {model} on {limit} per min. Please try again in {wait:.3f}s.",
+                limit,
+                "rate_limit_exceeded",
+                {"Retry-After": f"{wait:.3f}", "x-ratelimit-reset-" + limit: f"{wait:.3f}s"},
+            )
+            return
+        if config.error_rate and random.random() < config.error_rate:
+            with state.stats.lock:
+                state.stats.errors += 1
+            self.send_error_json(500, "The server had an error while processing your request.", "server_error")
+            return
+
+        delay_ms = config.latency_ms + config.per_input_ms * len(texts) + random.uniform(0, config.jitter_ms)
+        started = time.monotonic()
+        vectors = state.embedder(dim)(texts)
+        time.sleep(max(0.0, delay_ms / 1000 - (time.monotonic() - started)))
+
+        # The openai client asks for base64 (packed little-endian float32) unless told otherwise
+        as_base64 = request.get("encoding_format") == "base64"
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": base64.b64encode(array("f", v).tobytes()).decode("ascii") if as_base64 else v,
+            }
+            for i, v in enumerate(vectors)
+        ]
+        with state.stats.lock:
+            state.stats.inputs += len(texts)
+            state.stats.tokens += tokens
+        self.send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+def make_server(host: str, port: int, config: StubConfig) -> ThreadingHTTPServer:
+    handler = type("StubHandler", (Handler,), {"state": StubState(config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a stub in a background thread (port 0 picks a free one); returns the server and its base URL."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name="embedding-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed latency per request")
+    parser.add_argument("--per-input-ms", type=float, default=0.0, help="extra latency per input text")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform random extra latency")
+    parser.add_argument("--rpm", type=float, default=0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="tokens per minute before 429s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        per_input_ms=args.per_input_ms,
+        jitter_ms=args.jitter_ms,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        error_rate=args.error_rate,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Embedding stub on http://{args.host}:{server.server_address[1]}/v1 ({config})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.RequestHandlerClass.state.stats.as_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+
+
+class FakeCollection:
+    created = []
+
+    def __init__(self, name, schema=None):
+        self.name = name
+        self.schema = schema
+        self.indexes = []
+        self.index_calls = []
+        self.loaded = False
+        FakeCollection.created.append(self)
+
+    def create_index(self, field_name, index_params):
+        self.index_calls.append((field_name, index_params))
+
+    def load(self):
+        self.loaded = True
+
+
+def fake_pymilvus(has_collection=False):
+    module = types.ModuleType("pymilvus")
+    module.DataType = types.SimpleNamespace(
+        INT64="INT64", VARCHAR="VARCHAR", FLOAT_VECTOR="FLOAT_VECTOR",
+        FLOAT16_VECTOR="FLOAT16_VECTOR", BINARY_VECTOR="BINARY_VECTOR",
+    )
+    module.FieldSchema = lambda **kwargs: kwargs
+    module.CollectionSchema = lambda fields, description="": types.SimpleNamespace(fields=fields, description=description)
+    module.Collection = FakeCollection
+    module.utility = types.SimpleNamespace(has_collection=lambda name: has_collection)
+    return module
+
+
+def test_ensure_collection_creates_collection_and_indexes(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pymilvus", fake_pymilvus())
+    FakeCollection.created = []
+    spec = ingest.CollectionSpec(
+        name="test_collection",
+        description="test",
+        fields=(ingest.TextField("topic", 64), ingest.TextField("text", 1024, index=False)),
+        embed_source="text",
+        dim=8,
+        vector_index="HNSW",
+    )
+
+    collection = ingest.ensure_collection(spec)
+
+    assert FakeCollection.created == [collection]
+    assert [f["name"] for f in collection.schema.fields] == ["id", "vector", "topic", "text"]
+    assert collection.index_calls == [
+        ("vector", {"index_type": "HNSW", "metric_type": "COSINE", "params": {"M": 16, "efConstruction": 200}}),
+        ("topic", {"index_type": "AUTOINDEX", "params": {}}),
+    ]
+    assert collection.loaded
@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import StubConfig, StubState, serve_in_thread  # noqa: E402
+
+
+def post(url, body):
+    request = urllib.request.Request(url + "/embeddings", data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.load(exc)
+
+
+def test_throttle_does_not_charge_a_request_rejected_for_tokens():
+    state = StubState(StubConfig(rpm=3, tpm=100))
+    assert state.throttle(100) is None
+    limited = state.throttle(100)
+    assert limited is not None and limited[0] == "tokens"
+    # Only the accepted request used a request slot
+    assert state.requests.available > 1.9
+
+
+def test_non_object_body_is_a_400():
+    server, url = serve_in_thread(StubConfig())
+    try:
+        for body in (["hello"], "hello", 3):
+            status, payload = post(url, body)
+            assert status == 400
+            assert payload["error"]["type"] == "invalid_request_error"
+        status, payload = post(url, {"input": "hello", "dimensions": 8})
+        assert status == 200 and len(payload["data"][0]["embedding"]) == 8
+    finally:
+        server.shutdown()
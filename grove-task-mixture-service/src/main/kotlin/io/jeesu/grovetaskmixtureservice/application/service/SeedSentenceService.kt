@@ -3,6 +3,7 @@ package io.jeesu.grovetaskmixtureservice.application.service
 import io.jeesu.grovetaskmixtureservice.domain.seed.SeedSentence
 import io.jeesu.grovetaskmixtureservice.domain.seed.SeedSentenceRepository
 import org.springframework.stereotype.Service
+import java.util.concurrent.ConcurrentHashMap
 
 @Service
 class SeedSentenceService(
@@ -22,9 +23,17 @@ class SeedSentenceService(
         collected.toList()
     }
 
+    private val centroids = ConcurrentHashMap<String, List<Float>>()
+
     fun getAll(batchSize: Int = 100): List<SeedSentence> = cached
 
-    fun getAvgVector(type: String): List<Float> {
+    fun getAvgVector(type: String): List<Float> =
+        centroids.getOrPut(type) {
+            // 미리 계산된 centroid 한 행을 읽고, 없을 때만 전체 문장을 읽어 평균을 낸다.
+            repository.findCentroid(type)?.vector ?: averageOf(type)
+        }
+
+    private fun averageOf(type: String): List<Float> {
         val vectors = cached
             .asSequence()
             .filter { it.type == type }
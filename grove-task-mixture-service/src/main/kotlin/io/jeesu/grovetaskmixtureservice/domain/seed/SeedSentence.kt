@@ -7,6 +7,15 @@ data class SeedSentence(
     val vector: List<Float>?
 )
 
+data class SeedCentroid(
+    val type: String,
+    val count: Long,
+    val norm: Float,
+    val vector: List<Float>
+)
+
 interface SeedSentenceRepository {
     fun findAll(page: Int, size: Int): List<SeedSentence>
+
+    fun findCentroid(type: String): SeedCentroid?
 }
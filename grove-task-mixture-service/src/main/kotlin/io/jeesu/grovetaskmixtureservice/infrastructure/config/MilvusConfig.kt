@@ -40,5 +40,6 @@ data class MilvusProperties(
     @Value("\${milvus.port:19530}") val port: Int,
     @Value("\${milvus.database:default}") val database: String,
     @Value("\${milvus.collection-name.seed-sentence:seed_sentence}") val seedSentenceCollection: String,
+    @Value("\${milvus.collection-name.seed-sentence-centroid:seed_sentence_centroid}") val seedCentroidCollection: String,
     @Value("\${milvus.collection-name.instruction-alpaca:instruction_alpaca}") val instructionCollection: String
 )
@@ -1,10 +1,12 @@
 package io.jeesu.grovetaskmixtureservice.infrastructure.repository
 
+import io.jeesu.grovetaskmixtureservice.domain.seed.SeedCentroid
 import io.jeesu.grovetaskmixtureservice.domain.seed.SeedSentence
 import io.jeesu.grovetaskmixtureservice.domain.seed.SeedSentenceRepository
 import io.jeesu.grovetaskmixtureservice.infrastructure.config.MilvusProperties
 import io.milvus.client.MilvusClient
 import io.milvus.param.R
+import io.milvus.param.collection.HasCollectionParam
 import io.milvus.param.collection.LoadCollectionParam
 import io.milvus.param.dml.QueryParam
 import io.milvus.grpc.QueryResults
@@ -53,4 +55,41 @@ class MilvusSeedSentenceRepository(
         }
         return results
     }
+
+    override fun findCentroid(type: String): SeedCentroid? {
+        // 파이썬 적재 스크립트가 만든 타입별 centroid 컬렉션. 없으면 null 을 돌려 전체 스캔으로 대체한다.
+        val exists = milvusClient.hasCollection(
+            HasCollectionParam.newBuilder()
+                .withCollectionName(properties.seedCentroidCollection)
+                .build()
+        )
+        if (exists.status != R.Status.Success.getCode() || exists.data != true) return null
+
+        milvusClient.loadCollection(
+            LoadCollectionParam.newBuilder()
+                .withCollectionName(properties.seedCentroidCollection)
+                .build()
+        )
+
+        val escaped = type.replace("\\", "\\\\").replace("\"", "\\\"")
+        val query: R<QueryResults> = milvusClient.query(
+            QueryParam.newBuilder()
+                .withCollectionName(properties.seedCentroidCollection)
+                .withExpr("type == \"$escaped\"")
+                .withLimit(1L)
+                .withOutFields(listOf("type", "count", "norm", "vector"))
+                .build()
+        )
+
+        if (query.status != R.Status.Success.getCode()) return null
+
+        val wrapper = QueryResultsWrapper(query.data)
+        if (wrapper.rowCount == 0L) return null
+        val count = (wrapper.getFieldWrapper("count").getFieldData()[0] as Number).toLong()
+        val norm = (wrapper.getFieldWrapper("norm").getFieldData()[0] as Number).toFloat()
+        val vector = (wrapper.getFieldWrapper("vector").getFieldData()[0] as? List<*>)
+            ?.map { (it as Number).toFloat() }
+            ?: return null
+        return SeedCentroid(type, count, norm, vector)
+    }
 }
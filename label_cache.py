@@ -0,0 +1,69 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, Optional, Sequence, Tuple
+
+DEFAULT_PATH = os.getenv(
+    "LABEL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".label_cache.sqlite"),
+)
+LOOKUP_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    """NFC, trimmed, whitespace runs collapsed: texts that only differ in layout share one label."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def label_key(text: str, prompt_version: str, model: str) -> bytes:
+    return hashlib.sha256("\0".join((model, prompt_version, normalize_text(text))).encode("utf-8")).digest()
+
+
+class LabelCache:
+    """On-disk (topic, task) cache in SQLite keyed by sha256(model, prompt version, normalized text)."""
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        # Streamlit reruns a page on a different thread each time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            " key BLOB PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " prompt_version TEXT NOT NULL,"
+            " topic TEXT NOT NULL,"
+            " task TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, Tuple[str, str]]:
+        found: Dict[bytes, Tuple[str, str]] = {}
+        with self.lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = list(keys[start:start + LOOKUP_CHUNK])
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(f"SELECT key, topic, task FROM labels WHERE key IN ({placeholders})", chunk)
+                found.update((key, (topic, task)) for key, topic, task in rows)
+        return found
+
+    def put(self, key: bytes, model: str, prompt_version: str, topic: str, task: str) -> None:
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?)", (key, model, prompt_version, topic, task))
+            self.conn.commit()
+
+    def entries(self, prompt_version: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM labels" + (" WHERE prompt_version = ?" if prompt_version else "")
+        with self.lock:
+            return self.conn.execute(query, [prompt_version] if prompt_version else []).fetchone()[0]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM labels")
+            self.conn.commit()
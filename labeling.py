@@ -0,0 +1,404 @@
+"""Topic / Task labeling with an OpenAI chat model, run concurrently.
+
+The Labeling page hands every text to ``label_concurrently``. A thread
+pool sends the requests under a requests-per-minute limit and retries
+transient API errors with exponential backoff. Results come back as each
+one completes, so the page can keep them as it goes.
+
+``label_batched`` puts several texts in one request and asks for a JSON
+array back. This saves repeating the taxonomy prompt for every text.
+Items whose labels are missing or not in the label lists are retried one
+at a time. ``compare_modes`` measures both modes on the same sample.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import openai
+
+# 도서 총류 000-999 기반 주제 라벨 정의
+TOPIC_LABELS = ["Computer Science, Information & General Works",
+                "Philosophy & Psychology",
+                "Religion",
+                "Social Sciences",
+                "Language",
+                "Science",
+                "Technology",
+                "Arts & Recreation",
+                "Literature",
+                "History & Geography"]
+# NLP 작업 유형 라벨 정의
+TASK_LABELS = ["Linguistic Analysis",
+               "Text Classification",
+               "Information Extraction",
+               "Creative Generation",
+               "Transformative Generation",
+               "Information Retrieval",
+               "Question Answering",
+               "Translation"]
+
+UNKNOWN = "Unknown"
+DEFAULT_MODEL = "gpt-4-turbo"
+_DECODER = json.JSONDecoder()
+
+
+def build_messages(text: str):
+    return [
+        {"role": "system", "content": "You are a helpful assistant that labels text data."},
+        {"role": "user", "content": f"Given the following text: '{text}', classify it into a topic and a task.\n\n"
+                                    f"Available Topics: {', '.join(TOPIC_LABELS)}.\n\n"
+                                    f"Available Tasks: {', '.join(TASK_LABELS)}.\n\n"
+                                    "Respond with the format:\nTopic: <One of the Topics>\nTask: <One of the Tasks>"}
+    ]
+
+
+# Changes whenever the prompt or the label lists change, which invalidates cached labels
+PROMPT_VERSION = hashlib.sha256(json.dumps(build_messages("{text}")).encode("utf-8")).hexdigest()[:12]
+
+
+def _normalize(label: str) -> str:
+    return re.sub(r"[^a-z0-9&]+", " ", label.lower()).strip()
+
+
+def match_label(value: str, labels, exact: bool = False) -> Optional[str]:
+    """The label ``value`` names: exact (case/punctuation-insensitive), else the longest label it contains."""
+    wanted = _normalize(value)
+    if not wanted:
+        return None
+    for label in labels:
+        if _normalize(label) == wanted:
+            return label
+    if exact:
+        return None
+    contained = [label for label in labels if _normalize(label) in wanted]
+    return max(contained, key=len) if contained else None
+
+
+_LINE = re.compile(r"^[\s*#>-]*(topic|task)\s*[*_]*\s*[:：-]\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_labels(reply: str) -> Tuple[str, str]:
+    """(topic, task) from a model reply; either is ``UNKNOWN`` if it cannot be found.
+
+    ``Topic:`` / ``Task:`` lines are found anywhere in the reply and in any order,
+    and markdown decoration is ignored. Without them, a reply that names exactly
+    one known label of a kind still counts.
+    """
+    found = {}
+    for key, value in _LINE.findall(reply or ""):
+        found.setdefault(key.lower(), value.strip().strip("*_`'\". "))
+    labels = []
+    for key, choices in (("topic", TOPIC_LABELS), ("task", TASK_LABELS)):
+        label = match_label(found[key], choices) if key in found else None
+        if label is None and key not in found:
+            mentioned = {choice for choice in choices if _normalize(choice) in _normalize(reply or "")}
+            # "Computer Science, ..." also contains "Science"; keep the longest
+            mentioned = {m for m in mentioned if not any(m != o and _normalize(m) in _normalize(o) for o in mentioned)}
+            label = mentioned.pop() if len(mentioned) == 1 else None
+        labels.append(label or UNKNOWN)
+    return labels[0], labels[1]
+
+
+class RateLimiter:
+    """Spaces calls at least 60/rpm seconds apart across threads (rpm <= 0 disables it)."""
+
+    def __init__(self, rpm: float) -> None:
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Connection errors, timeouts, 429s and 5xx; not bad requests or auth errors."""
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    return isinstance(exc, openai.APIStatusError) and (exc.status_code in (408, 409, 429) or exc.status_code >= 500)
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def with_retries(call: Callable[[], Any], limiter: RateLimiter, max_retries: int, base_delay: float = 1.0,
+                 max_delay: float = 60.0) -> Any:
+    """``call()`` under the rate limit, retrying transient errors with jittered exponential backoff."""
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return call()
+        except Exception as exc:
+            if attempt == max_retries or not is_retryable(exc):
+                raise
+            delay = retry_after(exc) or min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.5))
+    raise AssertionError("unreachable")
+
+
+class Usage:
+    """Requests and tokens spent, summed across threads."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, response) -> None:
+        usage = getattr(response, "usage", None)
+        with self._lock:
+            self.requests += 1
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+
+
+@dataclass
+class LabelResult:
+    topic: Optional[str] = None
+    task: Optional[str] = None
+    error: Optional[str] = None
+    reply: Optional[str] = None
+    # True when the labels came from a batched request (BATCH_PROMPT_VERSION), False for the single-item prompt
+    batched: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def gpt4_labeling(client, text: str, model: str = DEFAULT_MODEL, usage: Optional[Usage] = None) -> Tuple[str, str, str]:
+    """(topic, task, raw reply) for one text."""
+    response = client.chat.completions.create(
+        model=model,  # 또는 "gpt-3.5-turbo" 사용 가능
+        messages=build_messages(text),
+        max_tokens=150,
+        temperature=0.3
+    )
+    if usage is not None:
+        usage.add(response)
+    reply = response.choices[0].message.content or ""
+    topic, task = parse_labels(reply)
+    return topic, task, reply
+
+
+def label_concurrently(
+    client,
+    items: Iterable[Tuple[Any, str]],
+    model: str = DEFAULT_MODEL,
+    workers: int = 8,
+    rpm: float = 0,
+    max_retries: int = 5,
+    label_fn: Callable = gpt4_labeling,
+    usage: Optional[Usage] = None,
+) -> Iterator[Tuple[Any, LabelResult]]:
+    """Label ``(key, text)`` items on ``workers`` threads; yields ``(key, LabelResult)`` in completion order.
+
+    A failure (after retries) is yielded as a result with ``error`` set rather
+    than raised, so one bad item never stops the rest.
+    """
+    limiter = RateLimiter(rpm)
+
+    def work(text: str) -> LabelResult:
+        try:
+            topic, task, reply = with_retries(lambda: label_fn(client, text, model, usage), limiter, max_retries)
+        except Exception as exc:
+            return LabelResult(error=f"{type(exc).__name__}: {exc}")
+        return LabelResult(topic, task, reply=reply)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(work, text): key for key, text in items}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # Stopped early (e.g. the page was rerun): drop the queued requests
+            for future in futures:
+                future.cancel()
+
+
+# ======== Batched labeling ========
+
+
+def build_batch_messages(texts: Sequence[str]):
+    items = "\n".join(json.dumps({"id": i, "text": text}, ensure_ascii=False) for i, text in enumerate(texts, 1))
+    return [
+        {"role": "system", "content": "You are a helpful assistant that labels text data."},
+        {"role": "user", "content": f"Classify each of the following {len(texts)} texts into a topic and a task.\n\n"
+                                    f"Available Topics: {', '.join(TOPIC_LABELS)}.\n\n"
+                                    f"Available Tasks: {', '.join(TASK_LABELS)}.\n\n"
+                                    f"Texts (one JSON object per line):\n{items}\n\n"
+                                    "Respond with only a JSON array holding one object per text, in the format:\n"
+                                    '[{"id": <id>, "topic": "<One of the Topics>", "task": "<One of the Tasks>"}, ...]'}
+    ]
+
+
+BATCH_PROMPT_VERSION = hashlib.sha256(json.dumps(build_batch_messages(["{text}"])).encode("utf-8")).hexdigest()[:12]
+
+
+def parse_batch_reply(reply: str, size: int) -> Dict[int, Tuple[str, str]]:
+    """``{id: (topic, task)}`` for the items of a batched reply whose labels are both valid.
+
+    Ids run from 1 to ``size``. Items that are missing, duplicated, out of
+    range or carry a label outside ``TOPIC_LABELS`` / ``TASK_LABELS`` are left
+    out, so the caller can retry them on their own.
+    """
+    text = re.sub(r"^```(?:json)?|```$", "", (reply or "").strip(), flags=re.MULTILINE).strip()
+    # The first '[' that starts a complete JSON value; brackets in prose before or after it are ignored
+    items = None
+    start = text.find("[")
+    while items is None and start >= 0:
+        try:
+            items, _ = _DECODER.raw_decode(text, start)
+        except ValueError:
+            start = text.find("[", start + 1)
+    if items is None:
+        try:
+            items = json.loads(text)
+        except ValueError:
+            return {}
+    if isinstance(items, dict):
+        # {"items": [...]} or similar wrapper
+        items = next((v for v in items.values() if isinstance(v, list)), [])
+    out: Dict[int, Tuple[str, str]] = {}
+    seen = set()
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if item_id in seen:
+            out.pop(item_id, None)
+            continue
+        seen.add(item_id)
+        topic = match_label(str(item.get("topic", "")), TOPIC_LABELS, exact=True)
+        task = match_label(str(item.get("task", "")), TASK_LABELS, exact=True)
+        if 1 <= item_id <= size and topic and task:
+            out[item_id] = (topic, task)
+    return out
+
+
+def gpt4_batch_labeling(client, texts: Sequence[str], model: str = DEFAULT_MODEL,
+                        usage: Optional[Usage] = None) -> Tuple[Dict[int, Tuple[str, str]], str]:
+    """Valid ``{position: (topic, task)}`` (0-based) for one request holding all ``texts``, and the raw reply."""
+    response = client.chat.completions.create(
+        model=model,
+        messages=build_batch_messages(texts),
+        max_tokens=60 * len(texts) + 50,
+        temperature=0.3
+    )
+    if usage is not None:
+        usage.add(response)
+    reply = response.choices[0].message.content or ""
+    return {item_id - 1: labels for item_id, labels in parse_batch_reply(reply, len(texts)).items()}, reply
+
+
+def label_batched(
+    client,
+    items: Sequence[Tuple[Any, str]],
+    batch_size: int,
+    model: str = DEFAULT_MODEL,
+    workers: int = 8,
+    rpm: float = 0,
+    max_retries: int = 5,
+    usage: Optional[Usage] = None,
+) -> Iterator[Tuple[Any, LabelResult]]:
+    """Like ``label_concurrently``, but ``batch_size`` texts per request.
+
+    Items a batch leaves out or labels invalidly, and every item of a batch
+    that failed outright, are retried one at a time with the single-item
+    prompt on the same pool.
+    """
+    limiter = RateLimiter(rpm)
+
+    def batch_work(batch: Sequence[Tuple[Any, str]]):
+        try:
+            labels, reply = with_retries(
+                lambda: gpt4_batch_labeling(client, [text for _, text in batch], model, usage), limiter, max_retries
+            )
+        except Exception:
+            return {}, None
+        return labels, reply
+
+    def single_work(text: str) -> LabelResult:
+        try:
+            topic, task, reply = with_retries(lambda: gpt4_labeling(client, text, model, usage), limiter, max_retries)
+        except Exception as exc:
+            return LabelResult(error=f"{type(exc).__name__}: {exc}")
+        return LabelResult(topic, task, reply=reply)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {}
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            pending[pool.submit(batch_work, batch)] = ("batch", batch)
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, payload = pending.pop(future)
+                    if kind == "single":
+                        yield payload, future.result()
+                        continue
+                    labels, reply = future.result()
+                    for position, (key, text) in enumerate(payload):
+                        if position in labels:
+                            yield key, LabelResult(*labels[position], reply=reply, batched=True)
+                        else:
+                            pending[pool.submit(single_work, text)] = ("single", key)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def compare_modes(client, texts: Sequence[str], batch_size: int, model: str = DEFAULT_MODEL, workers: int = 8,
+                  rpm: float = 0) -> Dict[str, Any]:
+    """Label ``texts`` single-item and batched; requests, tokens, wall time and agreement of the two."""
+    report: Dict[str, Any] = {"texts": len(texts), "batch_size": batch_size}
+    results = {}
+    items = list(enumerate(texts))
+    for mode in ("single", "batched"):
+        usage = Usage()
+        start = time.perf_counter()
+        if mode == "single":
+            labeled = label_concurrently(client, items, model, workers, rpm, usage=usage)
+        else:
+            labeled = label_batched(client, items, batch_size, model, workers, rpm, usage=usage)
+        results[mode] = {key: result for key, result in labeled}
+        report[mode] = {
+            "requests": usage.requests,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "wall_s": round(time.perf_counter() - start, 2),
+            "failed": sum(not r.ok for r in results[mode].values()),
+        }
+    single, batched = results["single"], results["batched"]
+    both = [k for k, result in single.items() if result.ok and k in batched and batched[k].ok]
+    report["compared"] = len(both)
+    report["topic_agreement"] = sum(single[k].topic == batched[k].topic for k in both) / len(both) if both else 0.0
+    report["task_agreement"] = sum(single[k].task == batched[k].task for k in both) / len(both) if both else 0.0
+    report["both_agreement"] = sum(
+        (single[k].topic, single[k].task) == (batched[k].topic, batched[k].task) for k in both
+    ) / len(both) if both else 0.0
+    return report
@@ -1,5 +1,12 @@
+import os
+
 import streamlit as st
-import json
+
+from data_io import UPLOAD_TYPES, data_dir_path, load_dataframe, load_path, schema_of
+
+PREVIEW_ROWS = 20
+# 설정된 경우에만 이 디렉터리 안의 파일을 서버에서 직접 불러올 수 있음
+UPLOAD_DATA_DIR = os.getenv("UPLOAD_DATA_DIR")
 
 # 페이지 제목 설정
 st.title("Data Upload and Column Selection")
@@ -11,20 +18,54 @@ if "output_column" not in st.session_state:
     st.session_state["output_column"] = ""
 if "data" not in st.session_state:
     st.session_state["data"] = None
+if "data_version" not in st.session_state:
+    st.session_state["data_version"] = 0
 
-# JSON 파일 업로드 기능
-uploaded_file = st.file_uploader("Upload your JSON file", type=["json"])
+# 파일 업로드 기능 (JSON / JSONL / Parquet, 압축 파일 포함)
+uploaded_file = st.file_uploader("Upload your data file (JSON, JSONL or Parquet; gzip/bz2/xz/zstd allowed)",
+                                 type=UPLOAD_TYPES)
+# 업로드 한도를 넘는 대용량 파일은 UPLOAD_DATA_DIR 안에서 직접 불러오기
+server_file = st.text_input(f"Or load a file from {UPLOAD_DATA_DIR} on the server") if UPLOAD_DATA_DIR else ""
 
-if uploaded_file is not None:
+source = None
+try:
+    if uploaded_file is not None:
+        source = ("upload", uploaded_file.name, uploaded_file.size)
+    elif server_file:
+        server_path = data_dir_path(UPLOAD_DATA_DIR, server_file)
+        source = ("path", server_path, os.path.getsize(server_path))
+except FileNotFoundError:
+    st.error(f"File not found: {server_file}")
+except ValueError as e:
+    st.error(f"Could not read the file: {e}")
+
+if source is not None:
     try:
-        # 파일의 내용을 JSON 형식으로 파싱하고 세션에 데이터 저장
-        data = json.load(uploaded_file)
-        st.session_state["data"] = data
-        st.success("File uploaded successfully!")
+        # 같은 파일이면 다시 파싱하지 않음 (페이지가 다시 실행될 때마다 파싱하지 않도록)
+        if st.session_state.get("data_source") != source:
+            with st.spinner("Parsing..."):
+                if source[0] == "upload":
+                    df, info = load_dataframe(uploaded_file)
+                else:
+                    df, info = load_path(source[1])
+            info["memory_mib"] = round(df.memory_usage(deep=True).sum() / 2**20, 1)
+            st.session_state["data"] = df
+            st.session_state["data_info"] = info
+            st.session_state["data_source"] = source
+            st.session_state["data_version"] += 1
+            st.success("File uploaded successfully!")
+
+        df = st.session_state["data"]
+        info = st.session_state["data_info"]
 
-        # 업로드된 JSON 데이터 미리보기
-        st.write("Preview of the JSON data:")
-        st.json(data)
+        # 전체 데이터 대신 샘플, 스키마, 행 수만 미리보기
+        st.write(f"**{info['rows']:,} rows**, {info['columns']} columns ({info['format']}, "
+                 f"compression: {info['compression']}), parsed in {info['seconds']:.2f}s, "
+                 f"{info['memory_mib']:,.1f} MiB in memory")
+        st.write(f"Preview of the first {min(PREVIEW_ROWS, len(df))} rows:")
+        st.dataframe(df.head(PREVIEW_ROWS))
+        st.write("Schema:")
+        st.dataframe(schema_of(df), hide_index=True)
 
         # 입력/출력 컬럼 설정
         input_column = st.text_input("Enter the Input Column Name", value=st.session_state["input_column"])
@@ -37,7 +78,10 @@ if uploaded_file is not None:
 
         # 입력된 컬럼명을 확인하고 출력
         if st.button("Confirm Columns"):
-            if input_column and output_column:
+            missing = [c for c in (input_column, output_column) if c and c not in df.columns]
+            if missing:
+                st.warning(f"Column(s) not found in the data: {', '.join(missing)}")
+            elif input_column and output_column:
                 st.write(f"Input Column: `{input_column}`, Output Column: `{output_column}`")
                 st.success("Columns have been set successfully!")
             else:
@@ -46,7 +90,7 @@ if uploaded_file is not None:
         # 데이터가 세션 상태에 존재하고 컬럼도 설정되었으면 다음 페이지 이동 버튼 생성
         if st.session_state["data"] is not None and st.session_state["input_column"] and st.session_state["output_column"]:
             st.write("Data and columns have been set. You can proceed to the next page.")
-    except json.JSONDecodeError:
-        st.error("Invalid JSON file. Please upload a valid JSON file.")
-else:
-    st.info("Please upload a JSON file to get started.")
+    except ValueError as e:
+        st.error(f"Could not read the file: {e}")
+elif not server_file:
+    st.info("Please upload a data file to get started.")
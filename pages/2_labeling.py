@@ -1,9 +1,20 @@
+import os
+import time
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import openai
+
+from data_io import export_buttons
+from label_cache import LabelCache, label_key
+from labeling import (BATCH_PROMPT_VERSION, DEFAULT_MODEL, PROMPT_VERSION, UNKNOWN, compare_modes, label_batched,
+                      label_concurrently)
+from prelabel import (DEFAULT_EMBEDDING_MODEL, EmbeddingCache, NearestCentroid, embed_texts, evaluate_holdout,
+                      load_seed_task_centroids, predict_both, with_seed_centroids)
 
 # 세션에서 데이터와 컬럼명 가져오기
-if "data" not in st.session_state or "input_column" not in st.session_state or not st.session_state["data"]:
+if "data" not in st.session_state or "input_column" not in st.session_state or st.session_state["data"] is None \
+        or len(st.session_state["data"]) == 0:
     st.warning("No data found. Please go back to the Upload page and complete the process.")
     st.stop()
 
@@ -17,89 +28,235 @@ st.write(df[[input_column]].head())  # 입력 컬럼만 미리보기
 
 # OpenAI API Key 입력받기
 openai_api_key = st.text_input("Enter your OpenAI API Key", type="password")
+client = None
 if openai_api_key:
     from openai import OpenAI
-    openai.api_key = openai_api_key
-    client = OpenAI(api_key=openai_api_key)
-
-
-# GPT-4 라벨링 함수 정의
-def gpt4_labeling(text):
-    # 도서 총류 000-999 기반 주제 라벨 정의
-    topic_labels = ["Computer Science, Information & General Works",
-                    "Philosophy & Psychology",
-                    "Religion",
-                    "Social Sciences",
-                    "Language",
-                    "Science",
-                    "Technology",
-                    "Arts & Recreation",
-                    "Literature",
-                    "History & Geography"]
-    # NLP 작업 유형 라벨 정의
-    task_labels = ["Linguistic Analysis",
-                   "Text Classification",
-                   "Information Extraction",
-                   "Creative Generation",
-                   "Transformative Generation",
-                   "Information Retrieval",
-                   "Question Answering",
-                   "Translation"]
-
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant that labels text data."},
-        {"role": "user", "content": f"Given the following text: '{text}', classify it into a topic and a task.\n\n"
-                                    f"Available Topics: Computer Science, Information & General Works, "
-                                    f"Philosophy & Psychology, Religion, Social Sciences, Language, Science, Technology, "
-                                    f"Arts & Recreation, Literature, History & Geography.\n\n"
-                                    f"Available Tasks: Linguistic Analysis, Text Classification, Information Extraction, "
-                                    f"Creative Generation, Transformative Generation, Information Retrieval, "
-                                    f"Question Answering, Translation.\n\n"
-                                    "Respond with the format:\nTopic: <One of the Topics>\nTask: <One of the Tasks>"}
-    ]
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",  # 또는 "gpt-3.5-turbo" 사용 가능
-        messages=messages,
-        max_tokens=150,
-        temperature=0.3
-    )
-
-    # 응답에서 Topic과 Task 추출
-    output = response.choices[0].message.content.strip().split("\n")
-    topic = output[0].replace("Topic: ", "").strip()
-    task = output[1].replace("Task: ", "").strip()
-    return topic, task
+    # 재시도는 labeling 모듈이 직접 처리
+    client = OpenAI(api_key=openai_api_key, max_retries=0, timeout=60)
+
+# 병렬 처리 설정
+with st.expander("Labeling settings"):
+    model = st.text_input("Model", value=DEFAULT_MODEL)
+    workers = st.slider("Parallel requests", min_value=1, max_value=64, value=8)
+    rpm = st.number_input("Requests per minute (0 = no limit)", min_value=0, value=500, step=50)
+    max_retries = st.number_input("Retries per row", min_value=0, max_value=10, value=5)
+    batch_size = st.number_input("Texts per request (1 = one request per text)", min_value=1, max_value=100, value=1)
+    use_cache = st.checkbox("Reuse labels from previous runs (label cache)", value=True)
+
+# 임베딩 최근접 센트로이드 사전 라벨링: 마진이 작은 행만 LLM으로 보냄
+with st.expander("Local pre-labeling (embedding nearest centroid)"):
+    prelabel = st.checkbox("Label confident rows locally and send only ambiguous rows to the LLM", value=False)
+    threshold = st.slider("Margin threshold (top-1 minus top-2 cosine)", min_value=0.0, max_value=0.2, value=0.03,
+                          step=0.005, format="%.3f")
+    bootstrap_size = st.number_input("LLM-labelled rows needed before fitting centroids", min_value=20, value=500,
+                                     step=50)
+    # 시드 센트로이드는 일부 Task 라벨에만 있으므로 나머지 라벨은 라벨링된 행의 센트로이드를 사용
+    task_source = st.radio("Task centroids", ["Labelled rows", "Labelled rows, with seed sentence centroids (Milvus) where available"])
+    embedding_model = st.text_input("Embedding model", value=DEFAULT_EMBEDDING_MODEL)
+
+
+@st.cache_resource
+def get_label_cache():
+    return LabelCache()
+
+
+@st.cache_resource
+def get_vector_cache():
+    return EmbeddingCache()
+
+
+@st.cache_resource
+def get_seed_task_model():
+    return load_seed_task_centroids(os.getenv("MILVUS_HOST", "localhost"), int(os.getenv("MILVUS_PORT", "19530")))
+
+
+def llm_labelled_rows():
+    """Rows labelled by the LLM (or its cache) with usable labels: the ground truth for centroids."""
+    return [i for i, (topic, task) in labels.items() if i not in local_rows and UNKNOWN not in (topic, task)]
+
+
+def labelled_vectors():
+    rows = llm_labelled_rows()
+    texts = [str(df[input_column].iloc[i]) for i in rows]
+    vectors, _ = embed_texts(client, texts, embedding_model, get_vector_cache())
+    return vectors, [labels[i][0] for i in rows], [labels[i][1] for i in rows]
 
 
+def fit_local_models():
+    vectors, topics, tasks = labelled_vectors()
+    if not len(vectors):
+        return None, None
+    topic_model = NearestCentroid.fit(vectors, topics)
+    task_model = with_seed_centroids(NearestCentroid.fit(vectors, tasks), seed_task_model())
+    return topic_model, task_model
+
+
+def seed_task_model():
+    if task_source == "Labelled rows":
+        return None
+    model = get_seed_task_model()
+    if model is None:
+        st.warning("No usable seed centroids in Milvus; using Task centroids fitted on labelled rows only.")
+    return model
+
+
+# 라벨링 결과는 완료되는 즉시 행 단위로 세션에 저장 (중간에 실패해도 유지)
+labels_key = (st.session_state.get("data_version", 0), input_column, len(df))
+if st.session_state.get("labels_key") != labels_key:
+    st.session_state["labels_key"] = labels_key
+    st.session_state["labels"] = {}
+    st.session_state["label_errors"] = {}
+    st.session_state["local_rows"] = set()
+labels = st.session_state["labels"]
+errors = st.session_state["label_errors"]
+# 임베딩 센트로이드로 로컬에서 라벨을 붙인 행 (센트로이드 학습과 평가에서는 제외)
+local_rows = st.session_state["local_rows"]
+
+if labels:
+    st.info(f"{len(labels)} of {len(df)} rows are already labelled; only the remaining rows will be sent.")
+
 # 라벨링 작업 수행하기
 if st.button("Start Labelling"):
-    # 로딩 바 및 스피너 생성
-    progress_bar = st.progress(0)
+    if client is None:
+        st.warning("Please enter your OpenAI API Key first.")
+        st.stop()
+
     total_data = len(df)
-    topics, tasks = [], []
+    prompt_version = BATCH_PROMPT_VERSION if batch_size > 1 else PROMPT_VERSION
+    progress_bar = st.progress(len(labels) / total_data)
+    status = st.empty()
 
-    # 각 데이터포인트에 대해 GPT-4를 사용하여 라벨링 수행
+    # 같은 텍스트(정규화 후)는 한 번만 요청하고 결과를 해당하는 모든 행에 채움
+    rows_by_key = {}
+    text_by_key = {}
     for i, text in enumerate(df[input_column]):
-        topic, task = gpt4_labeling(str(text))
-        topics.append(topic)
-        tasks.append(task)
+        if i in labels:
+            continue
+        key = label_key(str(text), prompt_version, model)
+        rows_by_key.setdefault(key, []).append(i)
+        text_by_key.setdefault(key, str(text))
+    pending_rows = sum(len(rows) for rows in rows_by_key.values())
+
+    cache = get_label_cache() if use_cache else None
+    cached = cache.get_many(list(rows_by_key)) if cache is not None else {}
+    cache_rows = 0
+    for key, (topic, task) in cached.items():
+        for i in rows_by_key.pop(key):
+            labels[i] = (topic, task)
+            errors.pop(i, None)
+            cache_rows += 1
+    progress_bar.progress(len(labels) / total_data)
+
+    def send_to_llm(keys):
+        # 완료 순서대로 결과를 받아 진행 상태 업데이트
+        start = time.perf_counter()
+        items = [(key, text_by_key[key]) for key in keys]
+        if batch_size > 1:
+            labeled = label_batched(client, items, batch_size, model, workers, rpm, max_retries)
+        else:
+            labeled = label_concurrently(client, items, model, workers, rpm, max_retries)
+        for done, (key, result) in enumerate(labeled, 1):
+            for i in rows_by_key.pop(key):
+                if result.ok:
+                    labels[i] = (result.topic, result.task)
+                    errors.pop(i, None)
+                else:
+                    errors[i] = result.error
+            # 파싱에 실패한 응답은 캐시하지 않음
+            if cache is not None and result.ok and UNKNOWN not in (result.topic, result.task):
+                if result.batched or prompt_version == PROMPT_VERSION:
+                    cache.put(key, model, prompt_version, result.topic, result.task)
+                else:
+                    # 배치에서 빠져 단건 프롬프트로 다시 라벨링한 항목은 단건 버전으로 캐시
+                    cache.put(label_key(text_by_key[key], PROMPT_VERSION, model), model, PROMPT_VERSION,
+                              result.topic, result.task)
+            progress_bar.progress(len(labels) / total_data)
+            status.write(f"{len(labels)}/{total_data} rows labelled, {len(errors)} failed, "
+                         f"{done / (time.perf_counter() - start):.1f} texts/s")
+
+    api_rows = 0
+    local_count = 0
+    if prelabel:
+        # 1) 센트로이드를 만들 만큼 LLM 라벨이 없으면 무작위 일부를 먼저 LLM으로 라벨링
+        needed = bootstrap_size - len(llm_labelled_rows())
+        if needed > 0 and rows_by_key:
+            rng = np.random.default_rng(0)
+            keys = list(rows_by_key)
+            bootstrap = [keys[j] for j in rng.choice(len(keys), size=min(needed, len(keys)), replace=False)]
+            api_rows += sum(len(rows_by_key[key]) for key in bootstrap)
+            status.write(f"Labelling {len(bootstrap)} texts with the LLM to fit the centroids...")
+            send_to_llm(bootstrap)
+
+        # 2) 라벨링된 행으로 센트로이드 구성 후 3) 나머지 행을 임베딩해 마진이 큰 행은 바로 라벨 부여
+        topic_model, task_model = fit_local_models()
+        if topic_model is not None and task_model is not None and rows_by_key:
+            keys = list(rows_by_key)
+            with st.spinner(f"Embedding {len(keys)} texts..."):
+                vectors, _ = embed_texts(client, [text_by_key[key] for key in keys], embedding_model, get_vector_cache())
+            topics, tasks, margins = predict_both(topic_model, task_model, vectors)
+            for key, topic, task, margin in zip(keys, topics, tasks, margins):
+                if margin >= threshold:
+                    for i in rows_by_key.pop(key):
+                        labels[i] = (topic, task)
+                        local_rows.add(i)
+                        errors.pop(i, None)
+                        local_count += 1
+            progress_bar.progress(len(labels) / total_data)
+        else:
+            st.warning("Not enough labelled rows per label to fit centroids yet; all remaining rows go to the LLM.")
+
+    remaining_rows = sum(len(rows) for rows in rows_by_key.values())
+    api_rows += remaining_rows
+    st.write(f"{pending_rows} rows to label: {cache_rows} served from the label cache, "
+             f"{local_count} labelled locally by nearest centroid, "
+             f"{api_rows} sent to the API ({remaining_rows} rows as {len(rows_by_key)} unique texts in the last pass).")
+    send_to_llm(list(rows_by_key))
+
+    if errors:
+        st.warning(f"{len(errors)} rows failed after retries. Click 'Start Labelling' again to retry only those rows.")
+        st.write(pd.DataFrame({"row": list(errors), "error": list(errors.values())}).head(10))
+    else:
+        st.success("Labelling completed successfully!")
+
+# 임계값별 로컬 라벨 비율과 정확도 (LLM 라벨 중 일부를 평가용으로 분리)
+with st.expander("Pre-labeling accuracy vs threshold"):
+    st.write(f"Uses the {len(llm_labelled_rows())} rows labelled by the LLM so far; 20% are held out for evaluation.")
+    if st.button("Evaluate Thresholds"):
+        if client is None:
+            st.warning("Please enter your OpenAI API Key first.")
+            st.stop()
+        with st.spinner("Embedding the labelled rows..."):
+            vectors, topics, tasks = labelled_vectors()
+        sweep = evaluate_holdout(vectors, topics, tasks, seed_task_model()) if len(vectors) >= 10 else []
+        if not sweep:
+            st.warning("Label more rows with the LLM first (at least two labels of each kind are needed).")
+        else:
+            sweep_df = pd.DataFrame(sweep).set_index("threshold")
+            st.line_chart(sweep_df)
+            st.table(sweep_df)
 
-        # 진행 상태 업데이트
-        progress = (i + 1) / total_data
-        progress_bar.progress(progress)
+# 배치 라벨링과 단건 라벨링 비교 (샘플)
+with st.expander("Compare batched and single-item labeling"):
+    sample_size = st.number_input("Sample size", min_value=1, max_value=len(df), value=min(100, len(df)))
+    compare_batch = st.number_input("Texts per batched request", min_value=2, max_value=100, value=max(2, batch_size))
+    if st.button("Run Comparison"):
+        if client is None:
+            st.warning("Please enter your OpenAI API Key first.")
+            st.stop()
+        sample = df[input_column].sample(n=sample_size, random_state=42).astype(str).tolist()
+        with st.spinner("Labelling the sample in both modes..."):
+            report = compare_modes(client, sample, compare_batch, model, workers, rpm)
+        st.table(pd.DataFrame({mode: report[mode] for mode in ("single", "batched")}))
+        st.write(f"Agreement on {report['compared']} texts: topic {report['topic_agreement']:.1%}, "
+                 f"task {report['task_agreement']:.1%}, both {report['both_agreement']:.1%}")
 
-    # 라벨링 결과를 데이터프레임에 추가
-    df["Topic"] = topics
-    df["Task"] = tasks
+# 라벨링 결과를 데이터프레임에 추가 (실패한 행은 비워 둠)
+if labels:
+    df["Topic"] = [labels.get(i, (None, None))[0] for i in range(len(df))]
+    df["Task"] = [labels.get(i, (None, None))[1] for i in range(len(df))]
     st.session_state["data"] = df
 
-    st.success("Labelling completed successfully!")
     st.write(df[[input_column, "Topic", "Task"]].head(10))
 
-    # 라벨링 결과를 JSON 파일로 다운로드할 수 있도록 설정
-    st.download_button(
-        label="Download Labeled Data as JSON",
-        data=df.to_json(orient="records", indent=4),
-        file_name="gpt4_labeled_data.json",
-        mime="application/json"
-    )
+    # 라벨링 결과를 JSONL / Parquet 파일로 다운로드 (청크 단위로 파일에 기록)
+    export_buttons(st, df, "gpt4_labeled_data", key="labeling")
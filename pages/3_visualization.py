@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from data_io import export_buttons
+
 # 페이지 제목
 st.title("Labeled Data Visualization")
 
@@ -64,9 +66,4 @@ st.pyplot(plt.gcf())  # 그래프 출력
 
 # 데이터 다운로드 버튼 제공
 st.write("### Download Processed Data")
-st.download_button(
-    label="Download Labeled Data as CSV",
-    data=df.to_csv(index=False),
-    file_name="labeled_data_visualization.csv",
-    mime="text/csv"
-)
+export_buttons(st, df, "labeled_data_visualization", key="visualization")
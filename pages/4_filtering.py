@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import random
 
+from data_io import export_buttons
+
 # 페이지 제목 설정
 st.title("Labeled Data Filtering")
 
@@ -80,9 +82,4 @@ st.write(f"### Filtered Data: {len(filtered_df)} rows")
 st.write(filtered_df.head(10))
 
 # 필터링된 데이터 다운로드 버튼
-st.download_button(
-    label="Download Filtered Data as Json",
-    data=filtered_df.to_json(index=False, indent=4, orient='records'),
-    file_name="filtered_labeled_data.json",
-    mime="text/json"
-)
+export_buttons(st, filtered_df, "filtered_labeled_data", key="filtering")
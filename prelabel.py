@@ -0,0 +1,181 @@
+"""Local nearest-centroid pre-labeling, so only ambiguous rows go to the LLM.
+
+Rows are embedded in batches and scored with cosine similarity against
+one centroid per label. A row's label is the nearest centroid. It is
+trusted when the margin over the runner-up (top-1 minus top-2 cosine) is
+at least the threshold. Rows below the threshold are sent to the LLM.
+
+Centroids come from rows that are already labelled (the first rows the
+LLM labels, or labels reused from the cache). The per-type seed
+centroids that the embedding pipeline writes to ``seed_sentence_centroid``
+in Milvus can stand in for some of the Task centroids. Seed types are
+mapped onto Task labels with ``SEED_TYPE_TO_TASK`` (unmapped types are
+ignored). The seeds cover only a few Task labels, so they replace the
+fitted centroids of those labels and every other label keeps its fitted
+centroid (``with_seed_centroids``). Seed centroids are never used on
+their own.
+
+Embeddings go through the embedding pipeline's own ``EmbeddingCache``
+(loaded via ``embed_pipeline``; grove-task-mixture-embed/.embedding_cache.sqlite, or
+``EMBED_CACHE_PATH``). Texts it has already embedded, such as the alpaca
+``inputs``, are not embedded again.
+
+The seed centroids need ``pymilvus`` and a reachable Milvus. Without
+either, ``load_seed_task_centroids`` returns None and the caller falls
+back to centroids fitted on labelled rows.
+"""
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embed_pipeline import embedding_cache
+from labeling import TASK_LABELS
+
+EmbeddingCache = embedding_cache.EmbeddingCache
+
+DEFAULT_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+SEED_CENTROID_COLLECTION = os.getenv("SEED_CENTROID_COLLECTION", "seed_sentence_centroid")
+EMBED_BATCH_SIZE = 256
+# 시드 문장 type -> Task 라벨 (매핑이 없는 type은 사용하지 않음; Programming은 맞는 Task가 없어 제외)
+SEED_TYPE_TO_TASK = {
+    "Creative Writing": "Creative Generation",
+    "Grammar Correction": "Transformative Generation",
+    "History QA": "Question Answering",
+    "Math solution": "Question Answering",
+}
+
+
+def embed_texts(client, texts: Sequence[str], model: str = DEFAULT_EMBEDDING_MODEL,
+                cache: Optional[EmbeddingCache] = None, batch_size: int = EMBED_BATCH_SIZE) -> Tuple[np.ndarray, int]:
+    """L2-normalized float32 embeddings of ``texts`` and how many were served from ``cache``."""
+    found: Dict[str, np.ndarray] = {}
+    if cache is not None:
+        unique = list(dict.fromkeys(texts))
+        found = {t: np.asarray(v, dtype=np.float32) for t, v in zip(unique, cache.get_many(model, unique)) if v is not None}
+    missing = [t for t in dict.fromkeys(texts) if t not in found]
+    served = sum(1 for t in texts if t in found)
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        # 빈 문자열은 API가 거부하므로 공백 하나로 대체
+        response = client.embeddings.create(model=model, input=[t or " " for t in chunk])
+        vectors = np.asarray([d.embedding for d in sorted(response.data, key=lambda d: d.index)], dtype=np.float32)
+        if cache is not None:
+            cache.put_many(model, chunk, vectors.tolist())
+        found.update(zip(chunk, vectors))
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32), 0
+    matrix = np.stack([found[t] for t in texts]).astype(np.float32)
+    return normalize(matrix), served
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class NearestCentroid:
+    """Cosine nearest-centroid classifier with a top-1 vs top-2 margin."""
+
+    def __init__(self, labels: Sequence[str], centroids: np.ndarray) -> None:
+        self.labels = list(labels)
+        self.centroids = normalize(np.asarray(centroids, dtype=np.float32))
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, labels: Sequence[str], min_rows: int = 1) -> Optional["NearestCentroid"]:
+        """Mean vector per label (labels with fewer than ``min_rows`` rows are dropped); None if under two labels."""
+        labels = np.asarray(labels)
+        names = [name for name in dict.fromkeys(labels.tolist()) if (labels == name).sum() >= min_rows]
+        if len(names) < 2:
+            return None
+        return cls(names, np.stack([vectors[labels == name].mean(axis=0) for name in names]))
+
+    def predict(self, vectors: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """Nearest label and margin per row."""
+        scores = vectors @ self.centroids.T
+        top2 = np.partition(scores, -2, axis=1)[:, -2:]
+        best = scores.argmax(axis=1)
+        return [self.labels[i] for i in best], top2[:, 1] - top2[:, 0]
+
+
+def load_seed_task_centroids(host: str = "localhost", port: int = 19530,
+                             collection: str = SEED_CENTROID_COLLECTION) -> Optional[NearestCentroid]:
+    """Seed centroids in Milvus for the Task labels that have seed sentences (types mapped with ``SEED_TYPE_TO_TASK``).
+
+    Covers only some Task labels, so use it through ``with_seed_centroids``. None when pymilvus is not installed,
+    Milvus cannot be reached, or no seed type maps onto a Task label.
+    """
+    try:
+        from pymilvus import Collection, MilvusException, connections, utility
+    except ImportError:
+        return None
+
+    try:
+        connections.connect(host=host, port=port)
+        if not utility.has_collection(collection):
+            return None
+        rows = Collection(collection).query(expr="count > 0", output_fields=["type", "count", "vector"])
+    except MilvusException:
+        return None
+    # Several seed types may map to one Task: weight their centroids by row count
+    sums: Dict[str, np.ndarray] = {}
+    for row in rows:
+        task = SEED_TYPE_TO_TASK.get(row["type"])
+        if task in TASK_LABELS:
+            sums[task] = sums.get(task, 0) + np.asarray(row["vector"], dtype=np.float64) * row["count"]
+    if not sums:
+        return None
+    return NearestCentroid(list(sums), np.stack(list(sums.values())))
+
+
+def with_seed_centroids(fitted: Optional[NearestCentroid], seed: Optional[NearestCentroid]) -> Optional[NearestCentroid]:
+    """``fitted`` with its centroids replaced by ``seed`` for the labels ``seed`` has.
+
+    Labels without a seed centroid keep their fitted one. The seed centroids are never used on their own, because
+    then no row could be assigned a label without seed sentences. None when ``fitted`` is None.
+    """
+    if fitted is None or seed is None:
+        return fitted
+    centroids = dict(zip(fitted.labels, fitted.centroids))
+    centroids.update(zip(seed.labels, seed.centroids))
+    return NearestCentroid(list(centroids), np.stack(list(centroids.values())))
+
+
+def predict_both(topic_model: NearestCentroid, task_model: NearestCentroid,
+                 vectors: np.ndarray) -> Tuple[List[str], List[str], np.ndarray]:
+    """Topic and task per row; a row's margin is the smaller of its two margins."""
+    topics, topic_margins = topic_model.predict(vectors)
+    tasks, task_margins = task_model.predict(vectors)
+    return topics, tasks, np.minimum(topic_margins, task_margins)
+
+
+def evaluate_holdout(vectors: np.ndarray, topics: Sequence[str], tasks: Sequence[str],
+                     seed_task_model: Optional[NearestCentroid] = None, holdout: float = 0.2, seed: int = 0,
+                     thresholds: Sequence[float] = tuple(np.round(np.arange(0.0, 0.105, 0.005), 3))) -> List[Dict[str, float]]:
+    """Accuracy (topic and task both right) against coverage per threshold on a held-out share of labelled rows.
+
+    Centroids are fitted on the rest; ``seed_task_model`` replaces the fitted centroids of the Task labels it covers.
+    """
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    n_test = max(1, int(len(order) * holdout))
+    test, train = order[:n_test], order[n_test:]
+    topics, tasks = np.asarray(topics), np.asarray(tasks)
+    topic_model = NearestCentroid.fit(vectors[train], topics[train])
+    task_model = with_seed_centroids(NearestCentroid.fit(vectors[train], tasks[train]), seed_task_model)
+    if topic_model is None or task_model is None:
+        return []
+    predicted_topics, predicted_tasks, margins = predict_both(topic_model, task_model, vectors[test])
+    correct = (np.asarray(predicted_topics) == topics[test]) & (np.asarray(predicted_tasks) == tasks[test])
+    return threshold_sweep(correct, margins, thresholds)
+
+
+def threshold_sweep(correct: np.ndarray, margins: np.ndarray, thresholds: Sequence[float]) -> List[Dict[str, float]]:
+    """Share of rows at or above each margin threshold (coverage) and their accuracy."""
+    out = []
+    for threshold in thresholds:
+        covered = margins >= threshold
+        out.append({
+            "threshold": round(float(threshold), 3),
+            "local_share": float(covered.mean()) if len(covered) else 0.0,
+            "accuracy": float(correct[covered].mean()) if covered.any() else float("nan"),
+        })
+    return out